@@ -24,9 +24,10 @@ SECRET_KEY = '3vj8czn+w=ie#j)zf1ez#8301_x2a9jpbsfzfd$$k@g@6h=@4b'
 
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG also keeps every query of a request in memory
+DEBUG = bool(int(os.environ.get('DEBUG', 1)))
 
-ALLOWED_HOSTS = [ ]
+ALLOWED_HOSTS = [h for h in os.environ.get('ALLOWED_HOSTS', '').split(',') if h]
 
 # Application definition
 
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.HealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -74,6 +78,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# app.asgi runs requests in a pool of this many threads per process, while
+# slow clients are read from and written to on the event loop (see core.asgi)
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
@@ -84,9 +92,102 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # seconds a connection is kept for later requests, 0 closes it after each
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# kept connections idle for more than DB_CONN_HEALTH_CHECK_IDLE seconds are
+# checked at the start of a request and reopened when the server dropped them
+DB_CONN_HEALTH_CHECKS = bool(int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1)))
+DB_CONN_HEALTH_CHECK_IDLE = float(os.environ.get('DB_CONN_HEALTH_CHECK_IDLE', 10))
+
+# DB_POOL=1 shares a bounded pool of connections between the threads of a
+# process instead (see core.db.pool); requests wait up to DB_POOL_TIMEOUT
+# seconds for a free connection
+if int(os.environ.get('DB_POOL', 0)):
+    DATABASES['default'].update(
+        ENGINE='core.db.backends.postgresql_pool',
+        CONN_MAX_AGE=0,
+        POOL={
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+        },
+    )
+
+# Read replicas
+# DB_REPLICA_HOSTS=host1,host2 adds a database per replica, with the name and
+# credentials of default. Safe requests to the recipe, tag and ingredient
+# views read from them (see core.db.routers); after a write a user reads
+# from the primary for DB_REPLICA_PIN_SECONDS. The pin is kept per user in
+# the default cache (see core.db.routers), set CACHE_BACKEND so every process
+# sees it.
+
+DATABASE_REPLICAS = []
+for i, host in enumerate(h for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h):
+    DATABASES[f'replica_{i}'] = dict(
+        DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(f'replica_{i}')
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+# Caches
+# tag and ingredient lists are cached per user in the 'recipe' cache. It is a
+# local memory LRU with a TTL by default; set RECIPE_CACHE_BACKEND and
+# RECIPE_CACHE_LOCATION to a shared backend (e.g. memcached) when running
+# several processes.
+
+RECIPE_CACHE_TTL = int(os.environ.get('RECIPE_CACHE_TTL', 300))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recipe': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipe',
+        'TIMEOUT': RECIPE_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('RECIPE_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+
+# token -> user lookups of core.authentication.CachedTokenAuthentication.
+# Kept in process memory unless CACHE_BACKEND is set; the TTL then bounds how
+# long another process may keep accepting a token after it was revoked.
+CACHES['auth'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'auth',
+    'TIMEOUT': int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 60)),
+    'OPTIONS': {
+        'MAX_ENTRIES': int(os.environ.get('AUTH_TOKEN_CACHE_MAX_ENTRIES', 10000)),
+    },
+}
+
+# CACHE_BACKEND and CACHE_LOCATION move every cache to one shared backend,
+# e.g. django.core.cache.backends.memcached.MemcachedCache and memcached:11211.
+# The local memory defaults are only right for a single process: with several
+# workers a write invalidates the copy of the worker that served it and the
+# others keep serving stale lists and revoked tokens until the TTL.
+if os.environ.get('CACHE_BACKEND'):
+    for alias, cache_settings in CACHES.items():
+        cache_settings.pop('OPTIONS', None)  # locmem only
+        cache_settings.update(
+            BACKEND=os.environ.get('CACHE_BACKEND'),
+            LOCATION=os.environ.get('CACHE_LOCATION'),
+            KEY_PREFIX=alias,
+        )
+
+if os.environ.get('RECIPE_CACHE_BACKEND'):
+    CACHES['recipe'] = {
+        'BACKEND': os.environ.get('RECIPE_CACHE_BACKEND'),
+        'LOCATION': os.environ.get('RECIPE_CACHE_LOCATION'),
+        'TIMEOUT': RECIPE_CACHE_TTL,
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -124,7 +225,55 @@ USE_TZ = True
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
-MEDIA_ROOT = 'vol/web/media'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', 'vol/web/media')
 STATIC_ROOT = 'vol/web/static'
 
 AUTH_USER_MODEL = 'core.User'
+
+# Metrics
+# /metrics answers requests from METRICS_ALLOWED_IPS, or sending
+# "Authorization: Bearer <METRICS_TOKEN>"; the address is REMOTE_ADDR, which
+# is the proxy's for proxied requests, so the proxy refuses /metrics itself.
+# Every process keeps its own metrics (see core.metrics): under gunicorn a
+# scrape reads the worker that took it, not a total over the workers.
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip
+]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Password hashing
+# API signups, logins and password changes hash in a pool of worker processes
+# (see core.hashing), AUTH_HASH_WORKERS=0 computes them inside the request instead
+
+AUTH_HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', 2))
+# hashes queued or running before logins and signups get a 503
+AUTH_HASH_MAX_PENDING = int(os.environ.get('AUTH_HASH_MAX_PENDING', 16))
+AUTH_HASH_TIMEOUT = float(os.environ.get('AUTH_HASH_TIMEOUT', 5))  # seconds
+
+# Recipe images
+# uploads are validated, staged and processed by a pool of worker threads,
+# RECIPE_IMAGE_ASYNC=0 processes them inside the request instead
+
+RECIPE_IMAGE_ASYNC = bool(int(os.environ.get('RECIPE_IMAGE_ASYNC', 1)))
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_MAX_PENDING = int(os.environ.get('RECIPE_IMAGE_MAX_PENDING', 20))
+RECIPE_IMAGE_MAX_UPLOAD_BYTES = int(os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40 * 1000 * 1000))
+RECIPE_IMAGE_MAX_SIZE = 1600  # longest side of the served image
+RECIPE_IMAGE_THUMBNAIL_SIZE = 320
+
+# Bulk recipe import
+
+RECIPE_BULK_MAX_ITEMS = int(os.environ.get('RECIPE_BULK_MAX_ITEMS', 10000))
+RECIPE_BULK_BATCH_SIZE = 1000
+
+# Pagination
+# list endpoints are cursor paginated when a client sends ?cursor= or ?page_size=
+
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+API_ALWAYS_PAGINATE = bool(int(os.environ.get('API_ALWAYS_PAGINATE', 0)))
+
+# render list endpoints from values() rows instead of model serializers,
+# the output is identical (see recipe.rows)
+API_FAST_LISTS = bool(int(os.environ.get('API_FAST_LISTS', 1)))
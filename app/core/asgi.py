@@ -0,0 +1,159 @@
+"""ASGI adapter for the Django request handler
+
+Django 2.1 has no ASGI support and no async views, so this runs the regular
+handler (middleware, DRF views, ORM) in a bounded pool of worker threads.
+Everything that waits on the client happens on the event loop instead:
+reading the request body and writing the response. A slow client therefore
+costs a coroutine, not a thread, and the threads (and with them the
+database connections) are only held while Django actually works.
+"""
+import asyncio
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+
+
+class ClientDisconnected(Exception):
+    """the client went away before its request body was read"""
+
+
+def close_thread_connections(executor, workers):
+    """close the database connections of every thread of executor"""
+    barrier = threading.Barrier(workers)
+
+    def close():
+        # holding each thread at the barrier makes every thread run one job
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        connections.close_all()
+
+    for future in [executor.submit(close) for _ in range(workers)]:
+        future.result()
+
+
+class ASGIHandler:
+    """ASGI 3 application handing requests to Django in worker threads"""
+
+    def __init__(self, max_workers=None, executor=None):
+        self.wsgi = WSGIHandler()
+        self.max_workers = max_workers or settings.ASGI_THREADS
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'unsupported ASGI scope type {scope["type"]!r}')
+        try:
+            body = await self.read_body(receive)
+        except ClientDisconnected:
+            return
+        loop = asyncio.get_event_loop()
+        status, headers, chunks = await loop.run_in_executor(
+            self.executor, self.run_django, self.environ(scope, body)
+        )
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown(self):
+        """close the database connections of the workers and stop them"""
+        if isinstance(self.executor, ThreadPoolExecutor):
+            close_thread_connections(self.executor, self.max_workers)
+            self.executor.shutdown()
+
+    async def read_body(self, receive):
+        """return the request body as a file, spooled to disk when large"""
+        body = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                raise ClientDisconnected()
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return body
+
+    def environ(self, scope, body):
+        """return the WSGI environ of an ASGI http scope"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+            # WSGI carries the raw bytes of the path as latin-1
+            'PATH_INFO': scope['path'].encode().decode('latin1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin1').upper().replace('-', '_')
+            value = value.decode('latin1')
+            if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+                name = f'HTTP_{name}'
+            if name in environ:
+                value = f'{environ[name]},{value}'
+            environ[name] = value
+        # the body was read in full, which also covers chunked uploads
+        environ['CONTENT_LENGTH'] = str(body.seek(0, 2))
+        body.seek(0)
+        return environ
+
+    def run_django(self, environ):
+        """handle a request in a worker thread, return status, headers and body"""
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+
+        response = self.wsgi(environ, start_response)
+        try:
+            chunks = [chunk for chunk in response if chunk]
+        finally:
+            # sends request_finished, which releases the DB connection
+            response.close()
+            environ['wsgi.input'].close()
+        return started['status'], started['headers'], chunks
+
+
+def get_asgi_application():
+    """set up Django and return the ASGI application"""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
@@ -0,0 +1,51 @@
+import hashlib
+
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+CACHE_ALIAS = 'auth'
+
+
+def token_cache_key(key):
+    """return the cache key of a token, hashed so raw tokens never leave the process"""
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def user_cache_key(user_id):
+    """return the cache key remembering which token a user was cached under"""
+    return f'auth:user:{user_id}'
+
+
+def invalidate_token(key):
+    """forget a cached token"""
+    caches[CACHE_ALIAS].delete(token_cache_key(key))
+
+
+def invalidate_user(user_id):
+    """forget the cached token of a user"""
+    cache = caches[CACHE_ALIAS]
+    key = cache.get(user_cache_key(user_id))
+    if key is not None:
+        cache.delete_many([token_cache_key(key), user_cache_key(user_id)])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """token authentication caching the token -> user lookup
+
+    drop-in replacement for TokenAuthentication. Entries live in the 'auth'
+    cache (bounded LRU with a TTL) and are dropped by core.signals when the
+    token is deleted or its user is saved or deleted"""
+
+    def authenticate_credentials(self, key):
+        cache = caches[CACHE_ALIAS]
+        cached = cache.get(token_cache_key(key))
+        if cached is not None:
+            return cached
+        # raises AuthenticationFailed for unknown tokens and inactive users,
+        # failures are never cached
+        user, token = super().authenticate_credentials(key)
+        cache.set_many({
+            token_cache_key(key): (user, token),
+            user_cache_key(user.pk): key,
+        })
+        return user, token
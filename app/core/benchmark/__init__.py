@@ -0,0 +1,8 @@
+"""repeatable API benchmarks
+
+dataset seeds a realistic library of users, tags, ingredients and recipes,
+runner drives the API endpoints through the Django test client and reports
+latency percentiles, queries per request and the request rate of a single
+client as JSON. Run it with `python manage.py benchmark`; `loadtest` measures
+throughput under concurrent requests against a running server.
+"""
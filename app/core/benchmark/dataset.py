@@ -0,0 +1,92 @@
+import random
+import secrets
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import counts, search
+
+PASSWORD = 'benchmark-password'
+
+WORDS = (
+    'tomato', 'basil', 'garlic', 'onion', 'lemon', 'chicken', 'rice', 'bean',
+    'pepper', 'carrot', 'potato', 'cheese', 'olive', 'mint', 'yogurt', 'lentil',
+    'spinach', 'mushroom', 'ginger', 'honey', 'almond', 'salmon', 'pasta', 'egg',
+)
+
+
+def _name(rng, words=2):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _bulk_create(model, objs, batch_size):
+    """bulk_create in batches no larger than the backend accepts"""
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    limit = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    model.objects.bulk_create(objs, batch_size=min(batch_size, limit))
+
+
+def _link_rows(through, column, recipe_ids, attr_ids, per_recipe, rng):
+    """return M2M rows linking each recipe to per_recipe random attrs"""
+    rows = []
+    for recipe_id in recipe_ids:
+        for attr_id in rng.sample(attr_ids, min(per_recipe, len(attr_ids))):
+            rows.append(through(recipe_id=recipe_id, **{column: attr_id}))
+    return rows
+
+
+def seed(users=50, recipes=20000, tags=30, ingredients=100,
+         tags_per_recipe=3, ingredients_per_recipe=6, seed=0, batch_size=2000):
+    """create users with tokens and a library each, return the users
+
+    recipes is the total over all users, tags and ingredients are per user"""
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)  # hashed once, not once per user
+    User = get_user_model()
+    emails = [f'bench{i}@example.com' for i in range(users)]
+    User.objects.bulk_create([
+        User(email=email, name=email.split('@')[0], password=password) for email in emails
+    ])
+    user_objs = list(User.objects.filter(email__in=emails).order_by('id'))
+    Token.objects.bulk_create([Token(user=u, key=secrets.token_hex(20)) for u in user_objs])
+
+    _bulk_create(Tag, [
+        Tag(user=u, name=_name(rng, 1) + f' {i}') for u in user_objs for i in range(tags)
+    ], batch_size)
+    _bulk_create(Ingredient, [
+        Ingredient(user=u, name=_name(rng) + f' {i}')
+        for u in user_objs for i in range(ingredients)
+    ], batch_size)
+    per_user = max(recipes // max(users, 1), 1)
+    _bulk_create(Recipe, [
+        Recipe(
+            user=u,
+            title=_name(rng, 3),
+            time_minutes=rng.randint(5, 180),
+            price=rng.randint(100, 5000) / 100,
+            link='',
+        )
+        for u in user_objs for _ in range(per_user)
+    ], batch_size)
+
+    # ids are read back, sqlite cannot return them from bulk_create
+    for user in user_objs:
+        recipe_ids = list(Recipe.objects.filter(user=user).values_list('id', flat=True))
+        tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.filter(user=user).values_list('id', flat=True))
+        _bulk_create(Recipe.tags.through, _link_rows(
+            Recipe.tags.through, 'tag_id', recipe_ids, tag_ids, tags_per_recipe, rng
+        ), batch_size)
+        _bulk_create(Recipe.ingredients.through, _link_rows(
+            Recipe.ingredients.through, 'ingredient_id', recipe_ids, ingredient_ids,
+            ingredients_per_recipe, rng
+        ), batch_size)
+    # bulk inserts skip the signals maintaining the recipe counts and the
+    # search vectors
+    counts.recount(Tag)
+    counts.recount(Ingredient)
+    search.update_search_vectors()
+    return user_objs
@@ -0,0 +1,83 @@
+"""closed-loop HTTP load against a running server
+
+unlike the in-process scenarios of runner, requests go through the real
+application server, so different serving setups (runserver, gunicorn with
+its worker count, ASGI) can be compared on the same database.
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from .runner import percentile
+
+DEFAULT_PATHS = (
+    '/api/recipe/recipes/',
+    '/api/recipe/tags/',
+    '/api/recipe/ingredients/',
+    '/api/user/me/',
+)
+
+
+def obtain_token(base_url, email, password):
+    """log in through the API and return the token"""
+    request = urllib.request.Request(
+        base_url.rstrip('/') + '/api/user/token/',
+        data=json.dumps({'email': email, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response)['token']
+
+
+def fetch(url, token, timeout):
+    """GET url, return its status code or 'error'"""
+    request = urllib.request.Request(url, headers={'Authorization': f'Token {token}'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return 'error'
+
+
+def run(base_url, token, concurrency, duration, paths=DEFAULT_PATHS, timeout=30):
+    """keep concurrency clients requesting paths in turn for duration seconds"""
+    urls = [base_url.rstrip('/') + path for path in paths]
+    lock = threading.Lock()
+    latencies, statuses = [], Counter()
+    deadline = time.perf_counter() + duration
+
+    def client(n):
+        i = n
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = fetch(urls[i % len(urls)], token, timeout)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed * 1000)
+                statuses[str(status)] += 1
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return {
+        'url': base_url,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        'status_codes': dict(statuses),
+    }
@@ -0,0 +1,280 @@
+import io
+import json
+import math
+import platform
+import subprocess
+import threading
+import time
+from collections import Counter
+
+import django
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+from .dataset import PASSWORD
+
+
+class Scenario:
+    """one benchmarked request
+
+    path and data may be callables taking (context, iteration), setup runs
+    untimed before each request, e.g. to create the recipe a DELETE removes,
+    and settings are overridden while the scenario runs"""
+
+    def __init__(self, name, method, path, data=None, format='json', setup=None,
+                 authenticated=True, settings=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.format = format
+        self.setup = setup
+        self.authenticated = authenticated
+        self.settings = settings or {}
+
+    def resolve(self, value, context, i):
+        return value(context, i) if callable(value) else value
+
+
+class Context:
+    """state shared by the scenarios of a run"""
+
+    def __init__(self, user, token):
+        self.user = user
+        self.token = token
+        self.recipe = Recipe.objects.filter(user=user).order_by('id').first()
+        self.tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True)[:3])
+        self.ingredient_ids = list(
+            Ingredient.objects.filter(user=user).values_list('id', flat=True)[:3]
+        )
+        self.scratch = {}
+
+
+class LoginLoad:
+    """threads logging users in back to back while the scenarios run
+
+    shows what login storms cost the other endpoints, e.g. run with
+    AUTH_HASH_WORKERS=0 and with the hashing pool and compare"""
+
+    def __init__(self, users, threads):
+        self.emails = [user.email for user in users]
+        self.threads = [
+            threading.Thread(target=self.login, args=(n,), daemon=True)
+            for n in range(threads)
+        ]
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.statuses = Counter()
+
+    def login(self, n):
+        client = APIClient()
+        url = reverse('user:token')
+        try:
+            i = n
+            while not self.stop.is_set():
+                email = self.emails[i % len(self.emails)]
+                res = client.post(url, {'email': email, 'password': PASSWORD})
+                with self.lock:
+                    self.statuses[str(res.status_code)] += 1
+                i += len(self.threads)
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def report(self):
+        logins = sum(self.statuses.values())
+        return {
+            'threads': len(self.threads),
+            'logins': logins,
+            'logins_per_second': round(logins / self.elapsed, 1) if self.elapsed else None,
+            'status_codes': dict(self.statuses),
+        }
+
+
+def percentile(values, pct):
+    """nearest-rank percentile of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies, queries, statuses):
+    """return the report of one scenario, latencies in seconds"""
+    total = sum(latencies)
+    ms = [t * 1000 for t in latencies]
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'mean_ms': round(sum(ms) / len(ms), 3),
+        'max_ms': round(max(ms), 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+        # one client sending back to back, see the loadtest command for
+        # throughput under concurrent requests
+        'serial_rps': round(len(latencies) / total, 1) if total else None,
+        'status_codes': dict(Counter(str(s) for s in statuses)),
+    }
+
+
+def default_scenarios():
+    """every endpoint of recipe/urls.py and user/urls.py"""
+    recipes = reverse('recipe:recipe-list')
+    tags = reverse('recipe:tag-list')
+    ingredients = reverse('recipe:ingredient-list')
+
+    def detail(context, i):
+        return reverse('recipe:recipe-detail', args=[context.recipe.id])
+
+    def new_recipe(context, i):
+        return {
+            'title': f'bench recipe {i}',
+            'time_minutes': 10,
+            'price': '4.50',
+            'tags': context.tag_ids,
+            'ingredients': context.ingredient_ids,
+        }
+
+    def create_doomed(context, i):
+        context.scratch['doomed'] = Recipe.objects.create(
+            user=context.user, title='doomed', time_minutes=1, price=1
+        )
+
+    def doomed(context, i):
+        return reverse('recipe:recipe-detail', args=[context.scratch['doomed'].id])
+
+    def upload(context, i):
+        return reverse('recipe:recipe-upload-image', args=[context.recipe.id])
+
+    def photo(context, i):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), (i % 256, 80, 40)).save(buffer, format='JPEG')
+        return {'image': SimpleUploadedFile(f'photo{i}.jpg', buffer.getvalue())}
+
+    def csv(ids):
+        return ','.join(str(i) for i in ids)
+
+    return [
+        Scenario('tags.list', 'get', tags),
+        Scenario('tags.list.assigned_only', 'get', tags, {'assigned_only': 1}),
+        Scenario('tags.create', 'post', tags, lambda c, i: {'name': f'bench tag {i}'}),
+        Scenario('ingredients.list', 'get', ingredients),
+        Scenario('ingredients.list.assigned_only', 'get', ingredients, {'assigned_only': 1}),
+        Scenario('ingredients.create', 'post', ingredients,
+                 lambda c, i: {'name': f'bench ingredient {i}'}),
+        Scenario('recipes.list', 'get', recipes),
+        Scenario('recipes.list.page', 'get', recipes, {'page_size': 50}),
+        Scenario('recipes.list.tags_any', 'get', recipes,
+                 lambda c, i: {'tags': csv(c.tag_ids)}),
+        Scenario('recipes.list.tags_all', 'get', recipes,
+                 lambda c, i: {'tags': csv(c.tag_ids[:2]), 'match': 'all'}),
+        Scenario('recipes.list.search', 'get', recipes, {'search': 'tomato'}),
+        Scenario('recipes.retrieve', 'get', detail),
+        Scenario('recipes.create', 'post', recipes, new_recipe),
+        Scenario('recipes.stats', 'get', reverse('recipe:recipe-stats')),
+        Scenario('recipes.update', 'put', detail, new_recipe),
+        Scenario('recipes.partial_update', 'patch', detail,
+                 lambda c, i: {'title': f'renamed {i}'}),
+        # processed in the request: measures the decoding and resizing, and
+        # back to back uploads would otherwise only fill the worker queue
+        Scenario('recipes.upload_image', 'post', upload, photo, format='multipart',
+                 settings={'RECIPE_IMAGE_ASYNC': False}),
+        Scenario('recipes.destroy', 'delete', doomed, setup=create_doomed),
+        Scenario('recipes.bulk', 'post', reverse('recipe:recipe-bulk-create'),
+                 lambda c, i: [new_recipe(c, i * 10 + n) for n in range(10)]),
+        Scenario('user.create', 'post', reverse('user:create'),
+                 lambda c, i: {'email': f'bench-new-{i}@example.com',
+                               'password': 'password', 'name': 'new'},
+                 authenticated=False),
+        Scenario('user.token', 'post', reverse('user:token'),
+                 lambda c, i: {'email': c.user.email, 'password': PASSWORD},
+                 authenticated=False),
+        Scenario('user.me', 'get', reverse('user:me')),
+        Scenario('user.me.update', 'patch', reverse('user:me'), {'name': 'bench'}),
+    ]
+
+
+def run_scenario(scenario, context, iterations, warmup=1):
+    """run scenario iterations times after warmup untimed runs, return its report"""
+    client = APIClient()
+    if scenario.authenticated:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {context.token}')
+    latencies, queries, statuses = [], [], []
+    with override_settings(**scenario.settings):
+        for i in range(warmup + iterations):
+            if scenario.setup:
+                scenario.setup(context, i)
+            method = getattr(client, scenario.method)
+            path = scenario.resolve(scenario.path, context, i)
+            data = scenario.resolve(scenario.data, context, i)
+            fmt = scenario.format if scenario.method != 'get' else None
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                res = method(path, data, format=fmt)
+                elapsed = time.perf_counter() - start
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            queries.append(len(ctx.captured_queries))
+            statuses.append(res.status_code)
+    return summarize(latencies, queries, statuses)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(users, token, iterations, scenarios=None, only=None, login_load=0):
+    """run scenarios as the first user, return the full report
+
+    with login_load, that many threads keep logging the other users in"""
+    context = Context(users[0], token)
+    results = {}
+    with LoginLoad(users[1:] or users, login_load) as load:
+        for scenario in scenarios or default_scenarios():
+            if only and not any(scenario.name.startswith(o) for o in only):
+                continue
+            results[scenario.name] = run_scenario(scenario, context, iterations)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'iterations': iterations,
+        },
+        'results': results,
+    }
+    if login_load:
+        report['meta']['login_load'] = load.report()
+    return report
+
+
+def dumps(report):
+    return json.dumps(report, indent=2, sort_keys=True)
@@ -0,0 +1,78 @@
+"""time the model serializer against the values() row path of recipe lists
+
+lists are the first recipes by id over all users: a seeded user owns only
+recipes / users of them, too few for the list sizes worth comparing.
+"""
+import time
+
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import rows
+from recipe.serializers import RecipeSerializer
+
+from .runner import percentile
+
+
+def render_serializer(size):
+    """render the first size recipes through RecipeSerializer"""
+    queryset = Recipe.objects.order_by('id')[:size].prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('id').order_by('id')),
+        Prefetch('ingredients', queryset=Ingredient.objects.only('id').order_by('id')),
+    )
+    return JSONRenderer().render(RecipeSerializer(queryset, many=True).data)
+
+
+def render_rows(size):
+    """render the first size recipes from values() rows"""
+    serializer = RecipeSerializer()
+    columns = [f for f in serializer.rendered_fields if f not in ('tags', 'ingredients')]
+    recipes = list(
+        Recipe.objects.order_by('id').values(*columns)[:size]
+    )
+    ids = [recipe['id'] for recipe in recipes]
+    related = {
+        'tags': rows.related_ids(Recipe.tags.through, 'tag_id', ids),
+        'ingredients': rows.related_ids(Recipe.ingredients.through, 'ingredient_id', ids),
+    }
+    return JSONRenderer().render(rows.serialize_rows(serializer, recipes, related))
+
+
+def _time(render, size, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        body = render(size)
+        timings.append((time.perf_counter() - start) * 1000)
+    return body, timings
+
+
+def check_sizes(sizes):
+    """raise ValueError when there are fewer recipes than the largest size"""
+    if not sizes:
+        return
+    available = Recipe.objects.count()
+    if max(sizes) > available:
+        raise ValueError(
+            f'lists of {max(sizes)} recipes asked for, only {available} seeded'
+        )
+
+
+def compare(sizes, iterations):
+    """return {'serialization.<size>': timings of both paths}"""
+    check_sizes(sizes)
+    results = {}
+    for size in sizes:
+        expected, serializer_ms = _time(render_serializer, size, iterations)
+        body, rows_ms = _time(render_rows, size, iterations)
+        serializer_p50 = percentile(serializer_ms, 50)
+        rows_p50 = percentile(rows_ms, 50)
+        results[f'serialization.{size}'] = {
+            'rows': size,
+            'serializer_p50_ms': round(serializer_p50, 3),
+            'rows_p50_ms': round(rows_p50, 3),
+            'speedup': round(serializer_p50 / rows_p50, 2) if rows_p50 else None,
+            'identical': body == expected,
+        }
+    return results
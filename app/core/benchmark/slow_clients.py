@@ -0,0 +1,118 @@
+"""compare WSGI and ASGI serving with the same pool of threads to slow clients
+
+all clients arrive at once, latencies include waiting for a free thread.
+Every client needs `delay` seconds to send its request and again to receive
+the response, as on a bad mobile link. Under WSGI the server thread is held
+for all of it; under core.asgi only while Django runs.
+"""
+import asyncio
+import io
+import itertools
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.urls import reverse
+
+from core.asgi import ASGIHandler
+from core.models import Recipe
+
+from .runner import percentile
+
+
+def _paths(user, clients):
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    paths = [
+        reverse('recipe:recipe-list'),
+        reverse('recipe:tag-list'),
+        reverse('recipe:ingredient-list'),
+    ]
+    if recipe:
+        paths.append(reverse('recipe:recipe-detail', args=[recipe.id]))
+    return list(itertools.islice(itertools.cycle(paths), clients))
+
+
+def _scope(path, token):
+    return {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'authorization', f'Token {token}'.encode()),
+        ],
+    }
+
+
+def _report(latencies, statuses, wall, threads, delay):
+    ms = [t * 1000 for t in latencies]
+    return {
+        'clients': len(latencies),
+        'threads': threads,
+        'client_delay_ms': round(delay * 1000),
+        'wall_seconds': round(wall, 3),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+        'status_codes': dict(Counter(str(s) for s in statuses)),
+    }
+
+
+def run_wsgi(paths, token, delay, threads):
+    """thread per request: the thread waits out the slow client too"""
+    executor = ThreadPoolExecutor(max_workers=threads)
+    # only borrowed for its environ and Django call, run in our own threads
+    app = ASGIHandler(max_workers=threads, executor=executor)
+
+    def client(path):
+        time.sleep(delay)  # request trickling in
+        status, headers, chunks = app.run_django(app.environ(_scope(path, token), io.BytesIO()))
+        time.sleep(delay)  # response trickling out
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    results = list(executor.map(client, paths))
+    wall = time.perf_counter() - start
+    app.shutdown()
+    return _report([r[0] for r in results], [r[1] for r in results], wall, threads, delay)
+
+
+def run_asgi(paths, token, delay, threads):
+    """core.asgi: threads only for the Django part of each request"""
+    app = ASGIHandler(max_workers=threads)
+
+    async def client(path):
+        statuses = []
+
+        async def receive():
+            await asyncio.sleep(delay)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+            elif not message.get('more_body'):
+                await asyncio.sleep(delay)
+
+        await app(_scope(path, token), receive, send)
+        return time.perf_counter() - start, statuses[0]
+
+    async def clients():
+        return await asyncio.gather(*(client(path) for path in paths))
+
+    loop = asyncio.new_event_loop()
+    try:
+        start = time.perf_counter()
+        results = loop.run_until_complete(clients())
+        wall = time.perf_counter() - start
+    finally:
+        loop.close()
+    app.shutdown()
+    return _report([r[0] for r in results], [r[1] for r in results], wall, threads, delay)
+
+
+def compare(user, token, clients, delay, threads):
+    """return the reports of both servers for clients concurrent slow clients"""
+    paths = _paths(user, clients)
+    return {
+        'slow_clients.wsgi': run_wsgi(paths, token, delay, threads),
+        'slow_clients.asgi': run_asgi(paths, token, delay, threads),
+    }
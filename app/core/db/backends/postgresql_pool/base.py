@@ -0,0 +1,57 @@
+"""PostgreSQL backend taking its connections from a core.db.pool pool
+
+configured by the POOL entry of the database settings: MAX_SIZE connections
+per process, TIMEOUT seconds to wait for a free one. Use it with
+CONN_MAX_AGE=0 so that connections go back to the pool after each request.
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db import pool
+
+
+def _usable(conn):
+    return not conn.closed and (
+        conn.get_transaction_status() != extensions.TRANSACTION_STATUS_UNKNOWN
+    )
+
+
+def _reset(conn):
+    """roll back whatever the last user left open, False if conn is broken"""
+    if not _usable(conn):
+        return False
+    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL', {})
+        params = self.get_connection_params()
+        return pool.get_pool(self.alias, lambda: pool.ConnectionPool(
+            self.alias,
+            lambda: base.Database.connect(**params),
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 5.0),
+            check_usable=_usable,
+            reset=_reset,
+        ))
+
+    def get_new_connection(self, conn_params):
+        try:
+            connection = self.pool.acquire()
+        except pool.PoolTimeout as e:
+            # raised to the caller as django.db.OperationalError
+            raise base.Database.OperationalError(str(e)) from e
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level', connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.release(self.connection)
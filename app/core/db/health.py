@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.db import connections
+
+# time.monotonic() when a kept connection was last handed back by a request
+IDLE_SINCE = 'health_idle_since'
+
+
+def check_connections(**kwargs):
+    """close persistent connections that stopped working before a request uses them
+
+    connected to request_started. Only connections idle for more than
+    DB_CONN_HEALTH_CHECK_IDLE seconds cost a round trip: a connection a
+    request used moments ago is taken as alive, so busy workers and requests
+    running no query pay nothing. DB_CONN_HEALTH_CHECKS=0 turns it off"""
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is None or conn.in_atomic_block:
+            continue
+        idle_since = getattr(conn, IDLE_SINCE, None)
+        if idle_since is not None and now - idle_since < settings.DB_CONN_HEALTH_CHECK_IDLE:
+            continue
+        if not conn.is_usable():
+            conn.close()
+
+
+def mark_idle(**kwargs):
+    """remember when the connections kept after a request went idle
+
+    connected to request_finished, after close_old_connections"""
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is not None:
+            setattr(conn, IDLE_SINCE, now)
@@ -0,0 +1,147 @@
+"""bounded in-process pool of DB-API connections
+
+used by the postgresql_pool backend: Django "closes" its connection at the
+end of every request (CONN_MAX_AGE=0) and the pool hands it to the next
+request instead of a fresh connection being set up each time.
+"""
+import threading
+import time
+
+from core import metrics
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """raised when no connection became free within the wait timeout"""
+
+
+class ConnectionPool:
+    """at most max_size connections made by connect(), shared by threads
+
+    check_usable(conn) tells whether an idle connection can be handed out,
+    reset(conn) cleans up a returned one and returns False to discard it"""
+
+    def __init__(self, alias, connect, max_size=10, timeout=5.0,
+                 check_usable=None, reset=None):
+        self.alias = alias
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_usable = check_usable or (lambda conn: True)
+        self.reset = reset or (lambda conn: True)
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.discarded = 0
+
+    def acquire(self):
+        """return an idle or new connection, waiting up to timeout for one"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            waited = False
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self.check_usable(conn):
+                        return self._checked_out(conn)
+                    self._discard(conn)
+                if self._size < self.max_size:
+                    # connect outside the lock, the slot is ours meanwhile
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                    metrics.db_pool_waits.inc((self.alias,))
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        self.timeouts += 1
+                        metrics.db_pool_timeouts.inc((self.alias,))
+                        raise PoolTimeout(
+                            f'no connection to {self.alias!r} free after {self.timeout}s '
+                            f'({self.max_size} in use)'
+                        )
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+                self._publish()
+            raise
+        with self._cond:
+            return self._checked_out(conn)
+
+    def release(self, conn):
+        """take back a connection, discarding it if it cannot be reused"""
+        try:
+            reusable = self.reset(conn)
+        except Exception:
+            reusable = False
+        with self._cond:
+            if reusable:
+                self._idle.append(conn)
+            else:
+                self._discard(conn)
+            self._cond.notify()
+            self._publish()
+
+    def close(self):
+        """close every idle connection"""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._publish()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'discarded': self.discarded,
+            }
+
+    def _checked_out(self, conn):
+        self.checkouts += 1
+        self._publish()
+        return conn
+
+    def _discard(self, conn):
+        self._size -= 1
+        self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _publish(self):
+        idle = len(self._idle)
+        metrics.db_pool_connections.set(idle, (self.alias, 'idle'))
+        metrics.db_pool_connections.set(self._size - idle, (self.alias, 'in_use'))
+
+
+def get_pool(alias, factory):
+    """return the pool of alias, made by factory() on first use"""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = factory()
+        return pool
+
+
+def all_stats():
+    """return {alias: stats} of every pool of this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.alias: pool.stats() for pool in pools}
@@ -0,0 +1,82 @@
+"""send reads of replica-safe requests to read replicas
+
+the router reads from a replica only while a request has opted in through
+use_replica() (see core.middleware.ReplicaReadMixin); every write, every
+read outside such a request and all auth lookups stay on 'default'.
+
+a user who wrote is pinned to the primary for DATABASE_REPLICA_PIN_SECONDS
+so they read their own writes. The pin is kept per user in the default
+cache, which CACHE_BACKEND shares between processes, so it holds for every
+client and token of the user.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+# app labels or model labels always read from the primary: a token must be
+# accepted by the very next request, even before it reached the replicas
+PRIMARY_ONLY = ('authtoken', 'auth')
+
+_state = threading.local()
+
+
+@contextmanager
+def use_replica():
+    """read from the replicas inside the block, on this thread"""
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = False
+
+
+def reading_from_replica():
+    """return whether reads on this thread may go to a replica"""
+    return getattr(_state, 'replica', False)
+
+
+def pin_key(user_id):
+    return f'replica:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """send the reads of user_id to the primary for DATABASE_REPLICA_PIN_SECONDS"""
+    cache.set(pin_key(user_id), True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id), False)
+
+
+def choose_replica():
+    """return the alias to read from, None without replicas"""
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else None
+
+
+class ReplicaRouter:
+    """route reads to a replica inside use_replica(), everything else to default"""
+
+    def _pinned_to_primary(self, model):
+        meta = model._meta
+        return meta.app_label in PRIMARY_ONLY or meta.label_lower in PRIMARY_ONLY
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica() and not self._pinned_to_primary(model):
+            return choose_replica() or PRIMARY
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema from replication
+        return db == PRIMARY
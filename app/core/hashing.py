@@ -0,0 +1,158 @@
+"""password hashing in a bounded pool of worker processes
+
+PBKDF2 costs a request worker a few hundred milliseconds of CPU per login or
+password change. Hashes are computed by a process pool instead: the request
+waits for the result without holding the CPU, and once AUTH_HASH_MAX_PENDING
+hashes are queued further requests get a fast 503 rather than piling up.
+
+only the API signup, login and password change go through the pool (see
+user.serializers); User.set_password and check_password stay django's own,
+so the admin, createsuperuser and authenticate() never see HashingBusy.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, hashers
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core import metrics
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = None
+
+
+class HashingBusy(APIException):
+    """raised when the hashing pool cannot take another password"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('too many authentication requests, retry shortly')
+    default_code = 'hashing_busy'
+    # sent as Retry-After
+    wait = 1
+
+
+def get_executor():
+    """return the shared process pool, None when hashing runs inline"""
+    global _executor, _pending
+    if settings.AUTH_HASH_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # spawned workers do not inherit the locks and connections of
+            # a threaded server process
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.AUTH_HASH_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            _pending = threading.BoundedSemaphore(settings.AUTH_HASH_MAX_PENDING)
+    return _executor
+
+
+def shutdown():
+    """stop the pool, the next hash starts a new one"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def _done(future):
+    metrics.hash_pending.dec()
+    _pending.release()
+
+
+def _run(operation, func, *args):
+    """run func(*args) in the pool and wait for its result"""
+    start = time.perf_counter()
+    executor = get_executor()
+    if executor is None:
+        result = func(*args)
+    else:
+        if not _pending.acquire(blocking=False):
+            metrics.hash_rejected.inc((operation,))
+            raise HashingBusy()
+        metrics.hash_pending.inc()
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            _done(None)
+            shutdown()
+            raise HashingBusy()
+        # the slot is held until the worker is done, even if we stop waiting
+        future.add_done_callback(_done)
+        try:
+            result = future.result(timeout=settings.AUTH_HASH_TIMEOUT)
+        except TimeoutError:
+            metrics.hash_rejected.inc((operation,))
+            raise HashingBusy()
+        except BrokenProcessPool:
+            shutdown()
+            raise HashingBusy()
+    metrics.hash_duration.observe(time.perf_counter() - start, (operation,))
+    return result
+
+
+def make_password(password):
+    """hashers.make_password with the hash computed in the pool"""
+    if password is None:
+        return hashers.make_password(None)
+    hasher = hashers.get_hasher()
+    return _run('encode', hasher.encode, password, hasher.salt())
+
+
+def check_password(password, encoded, setter=None):
+    """hashers.check_password with the hash computed in the pool"""
+    if password is None or not hashers.is_password_usable(encoded):
+        return False
+    preferred = hashers.get_hasher()
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = _run('verify', hasher.verify, password, encoded)
+    if not is_correct and not hasher_changed and must_update:
+        _run('verify', hasher.harden_runtime, password, encoded)
+    if setter and is_correct and must_update:
+        setter(password)
+    return is_correct
+
+
+def set_password(user, raw_password):
+    """user.set_password with the hash computed in the pool"""
+    user.password = make_password(raw_password)
+    user._password = raw_password
+
+
+def check_user_password(user, raw_password):
+    """user.check_password with the hash computed in the pool, upgrading stale hashes"""
+    def setter(raw_password):
+        set_password(user, raw_password)
+        # password_changed() must not run for a mere hash upgrade
+        user._password = None
+        user.save(update_fields=['password'])
+    return check_password(raw_password, user.password, setter)
+
+
+def authenticate(email, password):
+    """return the active user with email and password, None otherwise
+
+    ModelBackend.authenticate with the hashes computed in the pool"""
+    User = get_user_model()
+    try:
+        user = User._default_manager.get_by_natural_key(email)
+    except User.DoesNotExist:
+        # hash anyway, so unknown emails take as long as wrong passwords
+        make_password(password)
+        return None
+    if check_user_password(user, password) and user.is_active:
+        return user
+    return None
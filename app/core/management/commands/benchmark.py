@@ -0,0 +1,127 @@
+import json
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from rest_framework.authtoken.models import Token
+
+from core.benchmark import dataset, runner, serialization, slow_clients
+
+
+class Command(BaseCommand):
+    """ benchmark every API endpoint on a seeded dataset and report JSON"""
+    help = 'seed a dataset and report latency, queries and serial request rate per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=20000,
+                            help='recipes over all users')
+        parser.add_argument('--tags', type=int, default=30, help='tags per user')
+        parser.add_argument('--ingredients', type=int, default=100,
+                            help='ingredients per user')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', nargs='*',
+                            help='run scenarios whose name starts with one of these')
+        parser.add_argument('--output', help='write the JSON report to this file')
+        parser.add_argument('--compare', help='print deltas against a previous report')
+        parser.add_argument('--serialization', nargs='*', type=int, metavar='SIZE',
+                            help='also time serializer against values() rows on lists of these sizes, '
+                                 'taken over all users')
+        parser.add_argument('--login-load', type=int, default=0, metavar='THREADS',
+                            help='keep this many threads logging users in while benchmarking')
+        parser.add_argument('--slow-clients', type=int, default=0, metavar='CLIENTS',
+                            help='also serve this many concurrent slow clients through WSGI and ASGI')
+        parser.add_argument('--slow-client-delay', type=int, default=200, metavar='MS',
+                            help='time a slow client takes to send its request and to read the response')
+        parser.add_argument('--slow-client-threads', type=int, default=8, metavar='THREADS',
+                            help='server threads of both WSGI and ASGI')
+        parser.add_argument('--current-db', action='store_true',
+                            help='seed the configured database instead of a throwaway test database')
+
+    def handle(self, *args, **options):
+        try:
+            setup_test_environment()
+            own_environment = True
+        except RuntimeError:
+            # already inside a test run
+            own_environment = False
+        old_config = None
+        if not options['current_db']:
+            old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # uploaded images go to a throwaway media root too
+            with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+                report = self.benchmark(options)
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+            if own_environment:
+                teardown_test_environment()
+
+        output = runner.dumps(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(json.load(f), report)
+
+    def benchmark(self, options):
+        start = time.perf_counter()
+        users = dataset.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            seed=options['seed'],
+        )
+        seeded = time.perf_counter() - start
+        try:
+            # before spending the time of the scenarios
+            serialization.check_sizes(options['serialization'])
+        except ValueError as e:
+            raise CommandError(e)
+        token = Token.objects.get(user=users[0]).key
+        report = runner.run(
+            users, token, options['iterations'],
+            only=options['only'], login_load=options['login_load'],
+        )
+        if options['slow_clients']:
+            report['results'].update(slow_clients.compare(
+                users[0], token, options['slow_clients'],
+                options['slow_client_delay'] / 1000, options['slow_client_threads'],
+            ))
+        if options['serialization']:
+            report['results'].update(serialization.compare(
+                options['serialization'], options['iterations']
+            ))
+        report['meta']['dataset'] = {
+            'users': options['users'],
+            'recipes': options['recipes'],
+            'tags_per_user': options['tags'],
+            'ingredients_per_user': options['ingredients'],
+            'seed': options['seed'],
+            'seed_seconds': round(seeded, 2),
+        }
+        return report
+
+    def print_comparison(self, before, after):
+        """print p50/p95/queries of both reports side by side"""
+        self.stderr.write(f'{"scenario":<34} {"p50 ms":>16} {"p95 ms":>16} {"queries":>12}')
+        for name, new in sorted(after['results'].items()):
+            old = before['results'].get(name)
+            if old is None or 'p50_ms' not in new:
+                continue
+            self.stderr.write(
+                f'{name:<34} '
+                f'{old["p50_ms"]:>7} -> {new["p50_ms"]:<7} '
+                f'{old["p95_ms"]:>7} -> {new["p95_ms"]:<7} '
+                f'{old["queries_mean"]:>4} -> {new["queries_mean"]:<4}'
+            )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import http_load, runner
+
+
+class Command(BaseCommand):
+    """put HTTP load on a running server and report JSON"""
+    help = 'request API endpoints of a running server concurrently and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='base URL of the server, e.g. http://localhost:8000')
+        parser.add_argument('--token', help='API token to send')
+        parser.add_argument('--email', help='log in as this user instead of passing --token')
+        parser.add_argument('--password')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10, help='seconds')
+        parser.add_argument('--paths', nargs='*', default=list(http_load.DEFAULT_PATHS))
+        parser.add_argument('--output', help='write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        token = options['token']
+        if not token:
+            if not (options['email'] and options['password']):
+                raise CommandError('pass --token, or --email and --password')
+            token = http_load.obtain_token(options['url'], options['email'], options['password'])
+        report = http_load.run(
+            options['url'], token, options['concurrency'], options['duration'],
+            paths=options['paths'],
+        )
+        output = runner.dumps(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
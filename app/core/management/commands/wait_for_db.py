@@ -1,21 +1,70 @@
+import json
+import random
 import time
-from django.db import connections
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+from core import readiness, warmup
 
 
 class Command(BaseCommand):
     """ Django command to pause execuation until DB is ready"""
+    help = 'wait until the database answers, then check migrations and warm up'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='seconds to wait for the database before failing')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='longest pause between two attempts, in seconds')
+        parser.add_argument('--check-migrations', action='store_true',
+                            help='fail when migrations are pending')
+        parser.add_argument('--warm', action='store_true',
+                            help='load views, serializers and translations afterwards')
+        parser.add_argument('--timings', action='store_true',
+                            help='print the seconds spent per phase as JSON')
 
     def handle(self, *args, **options):
+        timings = {}
+        start = time.perf_counter()
+        self.wait(options['database'], options['timeout'], options['max_delay'])
+        timings['database'] = time.perf_counter() - start
+
+        if options['check_migrations']:
+            start = time.perf_counter()
+            pending = readiness.pending_migrations(options['database'])
+            timings['migrations'] = time.perf_counter() - start
+            if pending:
+                raise CommandError(
+                    f'{len(pending)} migrations pending: '
+                    + ', '.join(f'{m.app_label}.{m.name}' for m in pending)
+                )
+
+        if options['warm']:
+            start = time.perf_counter()
+            warmup.warm_up()
+            timings['warm_up'] = time.perf_counter() - start
+
+        if options['timings']:
+            self.stdout.write(json.dumps({k: round(v, 3) for k, v in timings.items()}))
+
+    def wait(self, alias, timeout, max_delay):
+        """retry SELECT 1 with exponential backoff and jitter"""
         self.stdout.write('Waiting for database')
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write("Database not available, waiting 1 second")
-                time.sleep(1)
-
+                readiness.check_database(alias)
+                break
+            except OperationalError as e:
+                # full jitter: spread restarts of many containers apart
+                delay = random.uniform(0, min(max_delay, 0.1 * 2 ** attempt))
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(f'database unavailable after {timeout}s: {e}')
+                self.stdout.write(f'Database not available, retrying in {delay:.2f}s')
+                time.sleep(delay)
+                attempt += 1
         self.stdout.write(self.style.SUCCESS("database available"))
-
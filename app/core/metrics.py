@@ -0,0 +1,201 @@
+"""in-process request metrics rendered in the Prometheus text format
+
+metrics live in the memory of each process: cheap to update (a dict lookup
+and a few additions under a lock) and scraped from /metrics. With several
+gunicorn workers each scrape reads the one worker that took it, not a total:
+counters jump between the workers' values and never add up across them.
+"""
+import bisect
+import threading
+
+# seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """base of the metric types, registers itself on creation"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += self.render_samples(items)
+        return lines
+
+
+class Counter(Metric):
+    """monotonically increasing value per label set"""
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render_samples(self, items):
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}'
+            for labels, value in items
+        ]
+
+
+class Gauge(Metric):
+    """value that goes up and down per label set"""
+    kind = 'gauge'
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render_samples(self, items):
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}'
+            for labels, value in items
+        ]
+
+
+class Histogram(Metric):
+    """observations counted in cumulative buckets per label set"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # one slot per bucket plus +Inf, then sum and count
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, labels=()):
+        state = self._values.get(labels)
+        return state[-1] if state else 0
+
+    def sum(self, labels=()):
+        state = self._values.get(labels)
+        return state[-2] if state else 0
+
+    def render_samples(self, items):
+        lines = []
+        for labels, state in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (float('inf'),), state):
+                cumulative += hits
+                le = _format_labels(self.labelnames, labels, [('le', _format_number(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            base = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{base} {_format_number(state[-2])}')
+            lines.append(f'{self.name}_count{base} {state[-1]}')
+        return lines
+
+
+def render():
+    """return every registered metric as Prometheus text"""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_LABELS = ('view', 'method')
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Wall time spent handling requests.',
+    REQUEST_LABELS,
+)
+request_db_duration = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries per request.',
+    REQUEST_LABELS,
+)
+request_queries = Histogram(
+    'http_request_db_queries', 'Database queries run per request.',
+    REQUEST_LABELS, buckets=QUERY_BUCKETS,
+)
+response_size = Histogram(
+    'http_response_size_bytes', 'Size of response bodies.',
+    REQUEST_LABELS, buckets=SIZE_BUCKETS,
+)
+responses = Counter(
+    'http_responses_total', 'Responses sent, by status code.',
+    REQUEST_LABELS + ('status',),
+)
+
+hash_pending = Gauge(
+    'password_hash_pending', 'Password hashes queued or running in the hashing pool.',
+)
+hash_rejected = Counter(
+    'password_hash_rejected_total', 'Password hashes refused because the pool was saturated.',
+    ('operation',),
+)
+hash_duration = Histogram(
+    'password_hash_duration_seconds', 'Time requests waited for a password hash.',
+    ('operation',),
+)
+
+db_pool_connections = Gauge(
+    'db_pool_connections', 'Pooled database connections, by state.',
+    ('alias', 'state'),
+)
+db_pool_waits = Counter(
+    'db_pool_waits_total', 'Checkouts that had to wait for a free pooled connection.',
+    ('alias',),
+)
+db_pool_timeouts = Counter(
+    'db_pool_timeouts_total', 'Checkouts that gave up waiting for a pooled connection.',
+    ('alias',),
+)
@@ -0,0 +1,105 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, views
+from .db import routers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class QueryTimer:
+    """connection execute wrapper adding up query count and time"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """record wall time, DB time, query count and response size per view"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        labels = (match.view_name if match else '<unresolved>', request.method)
+        metrics.request_duration.observe(duration, labels)
+        metrics.request_db_duration.observe(timer.duration, labels)
+        metrics.request_queries.observe(timer.count, labels)
+        if not response.streaming:
+            metrics.response_size.observe(len(response.content), labels)
+        metrics.responses.inc(labels + (str(response.status_code),))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """scope replica reads to the request and pin users who wrote to the primary
+
+    views opt in with ReplicaReadMixin, which decides once DRF has
+    authenticated the user. After a successful write the user reads from the
+    primary for DATABASE_REPLICA_PIN_SECONDS so they see their own writes,
+    from any client (see core.db.routers)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            request._replica_routing = stack
+            response = self.get_response(request)
+        # DRF sets the user it authenticated on the underlying request
+        user = getattr(request, 'user', None)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and settings.DATABASE_REPLICAS and user is not None and user.is_authenticated):
+            routers.pin_to_primary(user.pk)
+        return response
+
+
+class ReplicaReadMixin:
+    """read from the replicas on safe requests, unless the user is pinned
+
+    needs ReplicaRoutingMiddleware, which ends the replica reads with the response"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        routing = getattr(request._request, '_replica_routing', None)
+        if (routing is not None and request.method in SAFE_METHODS
+                and settings.DATABASE_REPLICAS and not routers.is_pinned(request.user.pk)):
+            routing.enter_context(routers.use_replica())
+
+
+class HealthCheckMiddleware:
+    """answer /healthz and /readyz before host validation, sessions and URL routing
+
+    orchestrators probe with the pod address as Host, which ALLOWED_HOSTS
+    would reject"""
+    checks = {'/healthz': views.healthz, '/readyz': views.readyz}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        check = self.checks.get(request.path_info)
+        if check is not None and request.method in SAFE_METHODS:
+            return check(request)
+        return self.get_response(request)
@@ -0,0 +1,24 @@
+# Generated by Django 2.1.15 on 2026-10-18 03:01
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('processing', 'processing'), ('ready', 'ready'), ('failed', 'failed')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(null=True, upload_to=core.models.recipe_image_file_path),
+        ),
+    ]
@@ -0,0 +1,69 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# frozen copy of recipe.search at the time of this migration
+SEARCH_CONFIG = 'english'
+
+UPDATE_SQL = """
+UPDATE {recipe} SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, {recipe}.title), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(t.name, ' ') FROM {tag} t
+        JOIN {recipe_tags} rt ON rt.tag_id = t.id
+        WHERE rt.recipe_id = {recipe}.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(i.name, ' ') FROM {ingredient} i
+        JOIN {recipe_ingredients} ri ON ri.ingredient_id = i.id
+        WHERE ri.recipe_id = {recipe}.id
+    ), '')), 'C')
+"""
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    """AddIndex that only touches PostgreSQL, other databases have no GIN"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """compute the search vector of every existing recipe, PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    sql = UPDATE_SQL.format(
+        recipe=Recipe._meta.db_table,
+        tag=apps.get_model('core', 'Tag')._meta.db_table,
+        ingredient=apps.get_model('core', 'Ingredient')._meta.db_table,
+        recipe_tags=Recipe._meta.get_field('tags').remote_field.through._meta.db_table,
+        recipe_ingredients=Recipe._meta.get_field('ingredients').remote_field.through._meta.db_table,
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql, {'config': SEARCH_CONFIG})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        AddPostgresIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_vector_gin'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
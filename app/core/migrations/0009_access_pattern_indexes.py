@@ -0,0 +1,43 @@
+# Generated by Django 2.1.15 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+# the through tables only index (recipe_id, tag_id) as a unique pair plus
+# each column alone, tag -> recipe lookups (assigned_only, ?tags=) want the
+# reverse pair so they are answered from the index alone
+THROUGH_INDEXES = (
+    ('core_recipe_tags', 'tag_id', 'core_recipe_tags_tag_recipe_idx'),
+    ('core_recipe_ingredients', 'ingredient_id', 'core_recipe_ingr_ingr_recipe_idx'),
+)
+
+
+def through_index_operations():
+    return [
+        migrations.RunSQL(
+            [f'CREATE INDEX {name} ON {table} ({column}, recipe_id)'],
+            [f'DROP INDEX {name}'],
+        )
+        for table, column, name in THROUGH_INDEXES
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name'], name='core_ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='core_tag_user_name_idx'),
+        ),
+    ] + through_index_operations()
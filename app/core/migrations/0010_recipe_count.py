@@ -0,0 +1,48 @@
+# Generated by Django 2.1.15 on 2026-10-18 03:26
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_recipe_counts(apps, schema_editor):
+    """store the number of recipes of every tag and ingredient"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', name)
+        through = Recipe._meta.get_field(field).remote_field.through
+        column = model._meta.model_name
+        counts = models.Subquery(
+            through.objects.filter(**{column: models.OuterRef('pk')})
+            .order_by().values(column).annotate(n=models.Count('recipe')).values('n'),
+            output_field=models.IntegerField(),
+        )
+        model.objects.update(recipe_count=Coalesce(counts, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count'], name='core_ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count'], name='core_tag_user_count_idx'),
+        ),
+        migrations.RunPython(backfill_recipe_counts, migrations.RunPython.noop),
+    ]
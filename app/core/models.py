@@ -1,9 +1,13 @@
 import uuid
 import os
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 
+from core.storage import ContentAddressedStorage
+
 
 def recipe_image_file_path(instance, filename):
     """generate file path for new recipe image"""
@@ -51,6 +55,17 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # recipes this is assigned to, maintained by recipe.counts
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # lists are filtered by user and ordered by name
+            models.Index(fields=['user', 'name'], name='core_tag_user_name_idx'),
+            # assigned_only (recipe_count > 0) and popularity ordering
+            models.Index(fields=['user', 'recipe_count'], name='core_tag_user_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -64,6 +79,17 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # recipes this is assigned to, maintained by recipe.counts
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # lists are filtered by user and ordered by name
+            models.Index(fields=['user', 'name'], name='core_ingredient_user_name_idx'),
+            # assigned_only (recipe_count > 0) and popularity ordering
+            models.Index(fields=['user', 'recipe_count'], name='core_ingredient_user_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -71,11 +97,22 @@ class Ingredient(models.Model):
 
 class Recipe(models.Model):
     """ Recipe model"""
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PROCESSING, 'processing'),
+        (IMAGE_READY, 'ready'),
+        (IMAGE_FAILED, 'failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE  # user deleted => all recipes of that user deleted
     )
     title = models.CharField(max_length=255)
+    # bumped on every write, including tag/ingredient (un)assignment (see recipe.signals)
+    updated_at = models.DateTimeField(auto_now=True)
     time_minutes = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     # blank make it optional, null=True will add more complexity to be checked ( value or non), blank only blank
@@ -85,7 +122,28 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     # pass a reference to the function so it can be called
     # every time we upload and its get called in the background by django
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # stored by content hash, identical images share one file
+    image = models.ImageField(
+        null=True, upload_to=recipe_image_file_path, storage=ContentAddressedStorage()
+    )
+    # small derivative of image, generated with it by recipe.images
+    image_thumbnail = models.ImageField(
+        null=True, upload_to=recipe_image_file_path, storage=ContentAddressedStorage()
+    )
+    # state of the last upload, blank when no image was ever uploaded
+    image_status = models.CharField(max_length=20, blank=True, choices=IMAGE_STATUS_CHOICES)
+    # title, tag and ingredient names as a tsvector, kept up to date by recipe.search
+    # on PostgreSQL (left null, and not indexed, on other databases)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # lists are filtered by user and ordered (and cursor paginated) by id,
+        # the M2M through tables are indexed by migration 0009
+        indexes = [
+            models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+            # full-text search, created on PostgreSQL only (see migration 0007)
+            GinIndex(fields=['search_vector'], name='core_recipe_search_vector_gin'),
+        ]
 
     def __str__(self):
         return self.title
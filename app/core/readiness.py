@@ -0,0 +1,25 @@
+"""checks telling whether this process can serve requests"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# aliases seen fully migrated, which stays true until the next deploy
+_migrated = set()
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    """run SELECT 1, raises django.db.OperationalError when unreachable"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def pending_migrations(alias=DEFAULT_DB_ALIAS):
+    """return the migrations not applied to alias yet"""
+    if alias in _migrated:
+        return []
+    executor = MigrationExecutor(connections[alias])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    pending = [migration for migration, backwards in plan]
+    if not pending:
+        _migrated.add(alias)
+    return pending
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication
+from .db import health
+
+# after django.db's close_old_connections, which drops connections past CONN_MAX_AGE
+request_started.connect(health.check_connections)
+request_finished.connect(health.mark_idle)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """a deleted token must stop authenticating straight away"""
+    authentication.invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """deactivated, updated or deleted users must not be served from cache"""
+    authentication.invalidate_user(instance.pk)
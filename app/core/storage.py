@@ -0,0 +1,65 @@
+"""content addressed file storage
+
+files are named after the sha256 of their bytes, under the directory and
+with the extension of the name they are saved as. Saving bytes that are
+already stored writes nothing and returns the existing name, so identical
+uploads share one file and a name never changes content, which lets it be
+cached forever. Files are not deleted when a row stops using them, several
+rows may share one: `gc_recipe_images` removes the unreferenced ones.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage naming and deduplicating files by content hash"""
+
+    def content_name(self, name, content):
+        """return the name the bytes of content are stored under"""
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        digest = digest.hexdigest()
+        return os.path.join(directory, digest[:2], f'{digest}{ext}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # a fresh mtime keeps the collector's grace period from
+            # deleting a file that is about to be referenced again
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                # collected between exists() and utime(), store it again
+                pass
+            else:
+                return name
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # the same name always means the same bytes, never add a suffix
+        return name
+
+    def _save(self, name, content):
+        # write under a unique name and move it in place, concurrent saves
+        # of the same bytes then both succeed with the same result
+        directory, basename = os.path.split(name)
+        temporary = super()._save(
+            os.path.join(directory, f'.{uuid.uuid4().hex}.{basename}'), content
+        )
+        os.replace(self.path(temporary), self.path(name))
+        return name
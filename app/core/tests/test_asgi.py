@@ -0,0 +1,91 @@
+import asyncio
+import json
+from concurrent.futures import Future
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.asgi import ASGIHandler
+from core.models import Tag
+
+TAG_URL = reverse('recipe:tag-list')
+
+
+class InlineExecutor:
+    """executor running jobs in the calling thread"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class ASGIHandlerTests(TestCase):
+    """test requests served through the ASGI adapter"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass1234')
+        self.token = Token.objects.create(user=self.user).key
+        self.app = ASGIHandler(executor=InlineExecutor())
+
+    def request(self, method, path, body=b'', headers=(), chunk_size=None):
+        """run one request, the body arrives in chunks of chunk_size"""
+        chunk_size = chunk_size or max(len(body), 1)
+        chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b'']
+        messages = [
+            {'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+            for i, chunk in enumerate(chunks)
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token}'.encode()),
+            ] + list(headers),
+        }
+        asyncio.get_event_loop().run_until_complete(self.app(scope, receive, send))
+        return sent[0], b''.join(m.get('body', b'') for m in sent[1:])
+
+    def test_get(self):
+        """test a list is served with the status, headers and body of Django"""
+        Tag.objects.create(user=self.user, name='vegan')
+        start, body = self.request('GET', TAG_URL)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'application/json'), start['headers'])
+        self.assertEqual(json.loads(body)[0]['name'], 'vegan')
+
+    def test_post_body_in_chunks(self):
+        """test a request body trickling in is reassembled"""
+        start, body = self.request(
+            'POST', TAG_URL, json.dumps({'name': 'slow link'}).encode(),
+            headers=[(b'content-type', b'application/json')], chunk_size=3,
+        )
+        self.assertEqual(start['status'], 201)
+        self.assertTrue(Tag.objects.filter(user=self.user, name='slow link').exists())
+
+    def test_lifespan(self):
+        """test startup and shutdown are acknowledged"""
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.get_event_loop().run_until_complete(
+            self.app({'type': 'lifespan'}, receive, send)
+        )
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
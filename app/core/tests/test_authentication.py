@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+RECIPE_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """test token lookups are cached and invalidated"""
+
+    def setUp(self):
+        caches['auth'].clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@gmail.com",
+            password="password123",
+            name="test"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """test only the first request resolves the token in the DB"""
+        # token lookup + recipes
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token_rejected(self):
+        """test unknown tokens are rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """test a cached token stops working once deleted"""
+        self.client.get(RECIPE_URL)
+        self.token.delete()
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """test a cached user stops authenticating once deactivated"""
+        self.client.get(RECIPE_URL)
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_not_stale(self):
+        """test updates through the me endpoint are seen on the next request"""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'new name'})
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'new name')
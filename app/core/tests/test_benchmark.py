@@ -0,0 +1,105 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, TestCase
+
+from core.benchmark import dataset, runner
+from core.models import Tag, Ingredient
+from recipe import counts
+
+
+class BenchmarkTests(TestCase):
+    """test the API benchmark suite"""
+
+    def test_percentile_nearest_rank(self):
+        """test percentiles pick an observed value"""
+        values = list(range(1, 101))
+        self.assertEqual(runner.percentile(values, 50), 50)
+        self.assertEqual(runner.percentile(values, 95), 95)
+        self.assertEqual(runner.percentile(values, 99), 99)
+        self.assertEqual(runner.percentile([7], 99), 7)
+        self.assertIsNone(runner.percentile([], 50))
+
+    def test_summarize(self):
+        """test a scenario report holds latency, queries and request rate"""
+        report = runner.summarize([0.01, 0.03], [2, 4], [200, 200])
+        self.assertEqual(report['p50_ms'], 10)
+        self.assertEqual(report['p99_ms'], 30)
+        self.assertEqual(report['queries_mean'], 3)
+        self.assertEqual(report['serial_rps'], 50)
+        self.assertEqual(report['status_codes'], {'200': 2})
+
+    def test_seed_stores_recipe_counts(self):
+        """test seeded tags and ingredients carry their real recipe counts"""
+        dataset.seed(users=2, recipes=10, tags=3, ingredients=4)
+        for model in (Tag, Ingredient):
+            self.assertFalse(counts.stale(model).exists())
+            self.assertTrue(model.objects.filter(recipe_count__gt=0).exists())
+
+    def test_benchmark_command_reports_json(self):
+        """test the command seeds data and reports every selected endpoint"""
+        out = StringIO()
+        call_command(
+            'benchmark', '--current-db', '--users', '2', '--recipes', '10',
+            '--tags', '3', '--ingredients', '3', '--iterations', '2',
+            '--only', 'tags.', 'recipes.list', 'recipes.retrieve', 'recipes.stats',
+            'recipes.update', 'recipes.upload_image', 'user.me',
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['dataset']['users'], 2)
+        results = report['results']
+        self.assertIn('recipes.list', results)
+        self.assertIn('user.me.update', results)
+        for name in ('recipes.stats', 'recipes.update', 'recipes.upload_image'):
+            self.assertIn(name, results)
+        self.assertNotIn('recipes.create', results)
+        for name, result in results.items():
+            self.assertEqual(result['requests'], 2)
+            self.assertTrue(all(code.startswith('2') for code in result['status_codes']), name)
+
+    def test_serialization_comparison(self):
+        """test both list renderings are timed over all users and produce the same JSON"""
+        out = StringIO()
+        call_command(
+            'benchmark', '--current-db', '--users', '2', '--recipes', '20',
+            '--tags', '3', '--ingredients', '3', '--iterations', '1',
+            '--only', 'none', '--serialization', '10', '20',
+            stdout=out,
+        )
+        results = json.loads(out.getvalue())['results']
+        self.assertEqual(results['serialization.10']['rows'], 10)
+        # more than the 10 recipes of any one user
+        self.assertEqual(results['serialization.20']['rows'], 20)
+        for result in results.values():
+            self.assertTrue(result['identical'])
+
+    def test_serialization_sizes_beyond_dataset_rejected(self):
+        """test asking for longer lists than seeded fails instead of truncating"""
+        with self.assertRaisesMessage(CommandError, 'only 20 seeded'):
+            call_command(
+                'benchmark', '--current-db', '--users', '2', '--recipes', '20',
+                '--tags', '3', '--ingredients', '3', '--iterations', '1',
+                '--only', 'none', '--serialization', '50',
+                stdout=StringIO(),
+            )
+
+
+class LoadTestTests(LiveServerTestCase):
+    """test the HTTP load generator against a live server"""
+
+    def test_loadtest_command(self):
+        """test the command logs in and reports every request"""
+        get_user_model().objects.create_user('test@gmail.com', 'pass1234')
+        out = StringIO()
+        call_command(
+            'loadtest', self.live_server_url, '--email', 'test@gmail.com',
+            '--password', 'pass1234', '--concurrency', '2', '--duration', '0.3',
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertGreater(report['requests'], 0)
+        self.assertEqual(report['status_codes'], {'200': report['requests']})
@@ -1,9 +1,13 @@
 """ helper command we will put infront of all docker compose commands
 this will ensures db is ready to accept commands and connections"""
 
-"""patch will allow us to mock the behaviour of the django get database function ( connection handler) """
+"""patch will allow us to mock the behaviour of the readiness checks """
+import json
+from io import StringIO
 from unittest.mock import patch
+
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -11,17 +15,65 @@ from django.test import TestCase
 class CommandTests(TestCase):
     def test_wait_for_db_ready(self):
         """ test waiting for db when db is available """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        with patch('core.readiness.check_database') as check:
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(check.call_count, 1)
+
+    @patch('random.uniform', side_effect=lambda low, high: high)
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db(self, ts, uniform):
+        """test waiting for db backs off exponentially up to max delay"""
+        with patch('core.readiness.check_database') as check:
+            check.side_effect = [OperationalError] * 7 + [None]
+            call_command('wait_for_db', '--max-delay', '1', stdout=StringIO())
+            self.assertEqual(check.call_count, 8)
+        delays = [c[0][0] for c in ts.call_args_list]
+        self.assertEqual(delays, [0.1, 0.2, 0.4, 0.8, 1, 1, 1])
 
     @patch('time.sleep', return_value=True)
-    def test_wait_for_db(self, ts):
-        """test waiting for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError]*5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+    def test_wait_for_db_timeout(self, ts):
+        """test giving up once the timeout would be exceeded"""
+        with patch('core.readiness.check_database', side_effect=OperationalError):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', '--timeout', '0', stdout=StringIO())
+
+    def test_wait_for_db_phases(self):
+        """test migrations are checked, the app warmed and phases timed"""
+        out = StringIO()
+        call_command('wait_for_db', '--check-migrations', '--warm', '--timings', stdout=out)
+        timings = json.loads(out.getvalue().splitlines()[-1])
+        self.assertEqual(set(timings), {'database', 'migrations', 'warm_up'})
+
+    def test_wait_for_db_pending_migrations(self):
+        """test pending migrations fail the check"""
+        with patch('core.readiness.pending_migrations', return_value=[]) as pending:
+            call_command('wait_for_db', '--check-migrations', stdout=StringIO())
+            pending.return_value = [type('Migration', (), {'app_label': 'core', 'name': '0010'})]
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', '--check-migrations', stdout=StringIO())
+
+
+class HealthCheckTests(TestCase):
+    """test the probes of the orchestrator"""
+
+    def test_healthz(self):
+        """test liveness answers without touching the database"""
+        with self.assertNumQueries(0):
+            res = self.client.get('/healthz', HTTP_HOST='10.0.0.7')
+        self.assertEqual(res.status_code, 200)
+
+    def test_readyz(self):
+        """test readiness checks the database and migrations"""
+        res = self.client.get('/readyz', HTTP_HOST='10.0.0.7')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'database': 'ok', 'migrations': 'ok'})
 
+        with patch('core.readiness.check_database', side_effect=OperationalError):
+            res = self.client.get('/readyz')
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['database'], 'unavailable')
 
+        with patch('core.readiness.pending_migrations', side_effect=OperationalError):
+            res = self.client.get('/readyz')
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json(), {'database': 'unavailable', 'migrations': 'unknown'})
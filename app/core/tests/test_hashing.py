@@ -0,0 +1,98 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import hashing, metrics
+
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+
+
+class HashingTests(TestCase):
+    """test passwords hashed in the process pool"""
+
+    def test_password_round_trip(self):
+        """test pool hashes verify and are standard django hashes"""
+        count = metrics.hash_duration.count(('encode',))
+        user = get_user_model().objects.create(email='test@gmail.com')
+        hashing.set_password(user, 'pass1234')
+        self.assertEqual(metrics.hash_duration.count(('encode',)), count + 1)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('pass1234'))
+        self.assertTrue(hashing.check_user_password(user, 'pass1234'))
+        self.assertFalse(hashing.check_user_password(user, 'wrong'))
+        self.assertEqual(metrics.hash_pending.value(), 0)
+
+    def test_stale_hash_upgraded(self):
+        """test hashes with outdated parameters are replaced on login"""
+        stale = PBKDF2PasswordHasher().encode('pass1234', 'salt', iterations=1000)
+        user = get_user_model().objects.create(email='test@gmail.com', password=stale)
+        self.assertTrue(hashing.check_user_password(user, 'pass1234'))
+        user.refresh_from_db()
+        self.assertNotEqual(user.password, stale)
+        self.assertTrue(hashing.check_user_password(user, 'pass1234'))
+
+    def test_authenticate(self):
+        """test only active users with the right password authenticate"""
+        user = get_user_model().objects.create_user('test@gmail.com', 'pass1234')
+        self.assertEqual(hashing.authenticate('test@gmail.com', 'pass1234'), user)
+        self.assertIsNone(hashing.authenticate('test@gmail.com', 'wrong'))
+        self.assertIsNone(hashing.authenticate('other@gmail.com', 'pass1234'))
+        user.is_active = False
+        user.save()
+        self.assertIsNone(hashing.authenticate('test@gmail.com', 'pass1234'))
+
+    @override_settings(AUTH_HASH_WORKERS=0)
+    def test_inline_hashing(self):
+        """test hashing stays in the request without workers"""
+        with patch.object(hashing, 'ProcessPoolExecutor') as pool:
+            user = get_user_model().objects.create(email='test@gmail.com')
+            hashing.set_password(user, 'pass1234')
+            self.assertTrue(hashing.check_user_password(user, 'pass1234'))
+        pool.assert_not_called()
+
+    def test_model_does_not_use_pool(self):
+        """test the admin and authenticate() keep working on a saturated pool"""
+        user = get_user_model().objects.create_user('test@gmail.com', 'pass1234')
+        hashing.get_executor()
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        with patch.object(hashing, '_pending', full):
+            self.assertTrue(user.check_password('pass1234'))
+            self.assertEqual(
+                authenticate(username='test@gmail.com', password='pass1234'), user
+            )
+
+    def test_saturated_pool_returns_503(self):
+        """test logins fail fast once the pool is full"""
+        get_user_model().objects.create_user('test@gmail.com', 'pass1234')
+        hashing.get_executor()
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        rejected = metrics.hash_rejected.value(('verify',))
+        with patch.object(hashing, '_pending', full):
+            res = APIClient().post(
+                TOKEN_URL, {'email': 'test@gmail.com', 'password': 'pass1234'}
+            )
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(metrics.hash_rejected.value(('verify',)), rejected + 1)
+
+    def test_saturated_pool_signup_returns_503(self):
+        """test signups fail fast once the pool is full"""
+        hashing.get_executor()
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        with patch.object(hashing, '_pending', full):
+            res = APIClient().post(
+                CREATE_USER_URL, {'email': 'test@gmail.com', 'password': 'pass1234', 'name': 'test'}
+            )
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(get_user_model().objects.exists())
@@ -0,0 +1,75 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from core.benchmark import dataset
+from core.models import Tag, Ingredient, Recipe
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL specific')
+class IndexPlanTests(TestCase):
+    """test the queries of recipe/views.py are planned as index scans"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = dataset.seed(users=20, recipes=4000, tags=30, ingredients=50)
+        cls.user = users[0]
+        with connection.cursor() as cursor:
+            for table in ('core_tag', 'core_ingredient', 'core_recipe',
+                          'core_recipe_tags', 'core_recipe_ingredients'):
+                cursor.execute(f'ANALYZE {table}')
+
+    def setUp(self):
+        # tables this small may be cheaper to scan whole, we check that a
+        # fitting index exists and is what the planner falls back to
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_attribute_lists_use_user_name_index(self):
+        """test tag and ingredient lists read (user_id, name) in order"""
+        plan = Tag.objects.filter(user=self.user).order_by('name').explain()
+        self.assertIn('core_tag_user_name_idx', plan)
+        self.assertNotIn('Sort', plan)
+        plan = Ingredient.objects.filter(user=self.user).order_by('name').explain()
+        self.assertIn('core_ingredient_user_name_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_recipe_pages_use_user_id_index(self):
+        """test a keyset page of recipes reads (user_id, id) in order"""
+        after = Recipe.objects.filter(user=self.user).order_by('id')[10].id
+        plan = Recipe.objects.filter(
+            user=self.user, id__gt=after
+        ).order_by('id')[:50].explain()
+        self.assertIn('core_recipe_user_id_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_tag_to_recipe_lookups_use_through_index(self):
+        """test ?tags= filters find recipe ids through the (tag_id, recipe_id) index"""
+        tag_ids = list(Tag.objects.filter(user=self.user).values_list('id', flat=True)[:3])
+        plan = Recipe.tags.through.objects.filter(
+            tag_id__in=tag_ids
+        ).values('recipe_id').explain()
+        # not django's own index on tag_id alone
+        self.assertIn('core_recipe_tags_tag_recipe_idx', plan)
+        self.assertNotIn('Seq Scan', plan)
+
+
+class ThroughIndexTests(TestCase):
+    """test the through tables carry the reverse (related, recipe) indexes"""
+
+    def assertIndex(self, table, name, columns):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        self.assertIn(name, constraints)
+        self.assertTrue(constraints[name]['index'])
+        self.assertEqual(constraints[name]['columns'], columns)
+
+    def test_through_tables_indexed_related_first(self):
+        self.assertIndex(
+            'core_recipe_tags', 'core_recipe_tags_tag_recipe_idx', ['tag_id', 'recipe_id']
+        )
+        self.assertIndex(
+            'core_recipe_ingredients', 'core_recipe_ingr_ingr_recipe_idx',
+            ['ingredient_id', 'recipe_id'],
+        )
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+METRICS_URL = reverse('metrics')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class HistogramTests(TestCase):
+    """test the in-process metric types"""
+
+    def setUp(self):
+        self.histogram = metrics.Histogram('test_seconds', 'test', ('view',), buckets=(1, 5))
+        self.addCleanup(metrics.REGISTRY.remove, self.histogram)
+
+    def test_histogram_cumulative_buckets(self):
+        """test histograms render cumulative buckets, sum and count"""
+        for value in (0.5, 3, 3, 10):
+            self.histogram.observe(value, ('home',))
+        lines = self.histogram.render()
+        self.assertIn('test_seconds_bucket{view="home",le="1"} 1', lines)
+        self.assertIn('test_seconds_bucket{view="home",le="5"} 3', lines)
+        self.assertIn('test_seconds_bucket{view="home",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_sum{view="home"} 16.5', lines)
+        self.assertIn('test_seconds_count{view="home"} 4', lines)
+
+
+class RequestMetricsTests(TestCase):
+    """test requests are measured and exposed on /metrics"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_recorded_per_view(self):
+        """test time, queries and size are recorded under the view name"""
+        Recipe.objects.create(user=self.user, title="soup", time_minutes=5, price=2)
+        labels = ('recipe:recipe-list', 'GET')
+        count = metrics.request_duration.count(labels)
+        queries = metrics.request_queries.sum(labels)
+        self.client.get(RECIPE_URL)
+        self.assertEqual(metrics.request_duration.count(labels), count + 1)
+        # recipes, tags, ingredients
+        self.assertEqual(metrics.request_queries.sum(labels), queries + 3)
+        self.assertGreater(metrics.request_db_duration.sum(labels), 0)
+        self.assertGreater(metrics.response_size.sum(labels), 0)
+        self.assertGreater(metrics.responses.value(labels + ('200',)), 0)
+
+    def test_metrics_endpoint(self):
+        """test the metrics are exposed in the Prometheus text format"""
+        self.client.get(RECIPE_URL)
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = res.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'http_request_db_queries_count{view="recipe:recipe-list",method="GET"}', body
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='')
+    def test_metrics_forbidden_by_default(self):
+        """test clients outside the allowed addresses cannot read metrics"""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='scrape-secret')
+    def test_metrics_with_token(self):
+        """test the metrics token is accepted from any address"""
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(res.status_code, 403)
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(res.status_code, 200)
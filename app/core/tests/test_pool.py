@@ -0,0 +1,113 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from core.db import health, pool
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """test the in-process connection pool"""
+
+    def make_pool(self, **kwargs):
+        self.connect = Mock(side_effect=FakeConnection)
+        kwargs.setdefault('check_usable', lambda conn: not conn.closed)
+        return pool.ConnectionPool('test', self.connect, **kwargs)
+
+    def test_connections_reused(self):
+        """test a released connection is handed out again"""
+        connections = self.make_pool()
+        conn = connections.acquire()
+        connections.release(conn)
+        self.assertIs(connections.acquire(), conn)
+        self.assertEqual(self.connect.call_count, 1)
+        stats = connections.stats()
+        self.assertEqual((stats['size'], stats['in_use'], stats['checkouts']), (1, 1, 2))
+
+    def test_broken_connections_discarded(self):
+        """test connections failing reset or the usability check are replaced"""
+        connections = self.make_pool(reset=lambda conn: False)
+        first = connections.acquire()
+        connections.release(first)
+        self.assertTrue(first.closed)
+        second = connections.acquire()
+        self.assertIsNot(second, first)
+        self.assertEqual(connections.stats()['discarded'], 1)
+
+    def test_bounded_with_timeout(self):
+        """test checkouts past max_size give up after the timeout"""
+        connections = self.make_pool(max_size=1, timeout=0.01)
+        connections.acquire()
+        with self.assertRaises(pool.PoolTimeout):
+            connections.acquire()
+        stats = connections.stats()
+        self.assertEqual((stats['waits'], stats['timeouts']), (1, 1))
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_waiter_gets_released_connection(self):
+        """test a waiting checkout takes the connection released meanwhile"""
+        connections = self.make_pool(max_size=1, timeout=5)
+        conn = connections.acquire()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(connections.acquire()))
+        waiter.start()
+        connections.release(conn)
+        waiter.join()
+        self.assertEqual(got, [conn])
+
+
+class HealthCheckTests(SimpleTestCase):
+    """test kept connections are checked when a request starts"""
+
+    def connection(self, usable=True, idle_since=None):
+        return Mock(
+            connection=object(), in_atomic_block=False,
+            is_usable=Mock(return_value=usable), health_idle_since=idle_since,
+        )
+
+    def test_unusable_connections_closed(self):
+        """test only open, idle, broken connections are closed"""
+        broken = self.connection(usable=False)
+        healthy = self.connection()
+        unopened = Mock(connection=None)
+        with patch.object(health.connections, 'all', return_value=[broken, healthy, unopened]):
+            health.check_connections()
+            broken.close.assert_called_once_with()
+            healthy.close.assert_not_called()
+            unopened.close.assert_not_called()
+
+            broken.close.reset_mock()
+            with override_settings(DB_CONN_HEALTH_CHECKS=False):
+                health.check_connections()
+            broken.close.assert_not_called()
+
+    @override_settings(DB_CONN_HEALTH_CHECK_IDLE=10)
+    def test_recently_used_connections_not_checked(self):
+        """test only connections idle past the interval cost a round trip"""
+        now = time.monotonic()
+        recent = self.connection(idle_since=now - 1)
+        stale = self.connection(usable=False, idle_since=now - 60)
+        with patch.object(health.connections, 'all', return_value=[recent, stale]):
+            health.check_connections()
+        recent.is_usable.assert_not_called()
+        stale.is_usable.assert_called_once_with()
+        stale.close.assert_called_once_with()
+
+    def test_idle_time_recorded_when_request_finishes(self):
+        """test kept connections are stamped at the end of a request"""
+        kept = self.connection()
+        unopened = Mock(connection=None, health_idle_since=None)
+        with patch.object(health.connections, 'all', return_value=[kept, unopened]):
+            health.mark_idle()
+        self.assertLessEqual(kept.health_idle_since, time.monotonic())
+        self.assertIsNone(unopened.health_idle_since)
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db import routers
+from core.models import Recipe, Tag
+from recipe import cache
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingTests(TestCase):
+    """test safe recipe reads go to replicas unless the client just wrote"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass1234')
+        self.client = self.client_for(self.user)
+        caches['default'].clear()
+        cache.get_cache().clear()
+        # record the routing decisions, the queries still run on default
+        self.reads = []
+        chooser = patch.object(routers, 'choose_replica', self.choose_replica)
+        chooser.start()
+        self.addCleanup(chooser.stop)
+
+    def choose_replica(self):
+        self.reads.append('replica_0')
+        return 'default'
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=user)[0].key}')
+        return client
+
+    def test_router(self):
+        """test reads use a replica only inside use_replica, auth data never"""
+        router = routers.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+        with routers.use_replica():
+            self.assertEqual(router.db_for_read(Recipe), 'default')
+            self.assertEqual(self.reads, ['replica_0'])
+            router.db_for_read(Token)
+            self.assertEqual(router.db_for_write(Recipe), 'default')
+        self.assertEqual(self.reads, ['replica_0'])
+        self.assertFalse(router.allow_migrate('replica_0', 'core'))
+
+    def test_safe_requests_read_from_replica(self):
+        """test recipe and tag lists read from a replica, other views do not"""
+        self.client.get(RECIPE_URL)
+        self.assertTrue(self.reads)
+        self.reads.clear()
+        self.client.get(ME_URL)
+        self.assertEqual(self.reads, [])
+
+    def test_writer_pinned_to_primary(self):
+        """test a user reads their own writes from the primary for a while"""
+        self.client.post(TAG_URL, {'name': 'vegan'})
+        self.reads.clear()
+        res = self.client.get(TAG_URL)
+        self.assertEqual(res.data[0]['name'], 'vegan')
+        self.assertEqual(self.reads, [])
+
+        # the pin holds for every client of the user, cookies or not
+        self.client_for(self.user).get(TAG_URL)
+        self.assertEqual(self.reads, [])
+
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass1234')
+        self.client_for(other).get(TAG_URL)
+        self.assertTrue(self.reads)
+
+        # the pin expired
+        self.reads.clear()
+        caches['default'].delete(routers.pin_key(self.user.pk))
+        self.client.get(RECIPE_URL)
+        self.assertTrue(self.reads)
+
+    def test_lagging_replica_not_cached(self):
+        """test rows read from a replica are neither cached nor given an ETag"""
+        # a write committed on the primary but not applied on the replica yet:
+        # the version moved on, the replica still returns the old rows
+        cache.bump_version(self.user.pk)
+        res = self.client.get(TAG_URL)
+        self.assertEqual(res.data, [])
+        self.assertNotIn('ETag', res)
+        self.assertEqual(self.client.get(STATS_URL).data['count'], 0)
+
+        # the replica caught up, the version did not move again (no signals)
+        Tag.objects.bulk_create([Tag(user=self.user, name='vegan')])
+        Recipe.objects.bulk_create([
+            Recipe(user=self.user, title='soup', time_minutes=5, price=1)
+        ])
+        res = self.client.get(TAG_URL)
+        self.assertEqual([tag['name'] for tag in res.data], ['vegan'])
+        self.assertEqual(self.client.get(STATS_URL).data['count'], 1)
+
+        # reads from the primary are cached and tagged as before
+        routers.pin_to_primary(self.user.pk)
+        res = self.client.get(TAG_URL)
+        self.assertIn('ETag', res)
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    """test files are named and deduplicated by content"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def test_name_is_content_hash(self):
+        digest = hashlib.sha256(b'image bytes').hexdigest()
+
+        name = self.storage.save('uploads/recipe/random.JPG', ContentFile(b'image bytes'))
+
+        self.assertEqual(name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'image bytes')
+
+    def test_identical_content_stored_once(self):
+        """test saving the same bytes twice returns the same file"""
+        first = self.storage.save('uploads/a.png', ContentFile(b'same'))
+        os.utime(self.storage.path(first), (0, 0))
+
+        second = self.storage.save('uploads/b.png', ContentFile(b'same'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.storage.listdir(os.path.dirname(first))[1], [os.path.basename(first)])
+        # reuse refreshes the mtime the collector's grace period looks at
+        self.assertGreater(os.path.getmtime(self.storage.path(first)), 0)
+
+    def test_file_collected_while_reused_stored_again(self):
+        """test a file deleted between the existence check and the touch is rewritten"""
+        name = self.storage.save('uploads/a.png', ContentFile(b'same'))
+
+        def collected(path):
+            os.remove(path)
+            raise FileNotFoundError(path)
+
+        with patch('core.storage.os.utime', side_effect=collected):
+            self.assertEqual(self.storage.save('uploads/b.png', ContentFile(b'same')), name)
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'same')
+
+    def test_different_content_different_names(self):
+        self.assertNotEqual(
+            self.storage.save('uploads/a.png', ContentFile(b'one')),
+            self.storage.save('uploads/a.png', ContentFile(b'two')),
+        )
+
+    def test_default_location_follows_media_root(self):
+        with override_settings(MEDIA_ROOT=self.root):
+            self.assertEqual(ContentAddressedStorage().location, self.root)
@@ -0,0 +1,26 @@
+from django.test import TestCase
+
+from core import warmup
+from recipe.serializers import (
+    RecipeSerializer, RecipeDetailSerializer, RecipeImageSerializer, TagSerializer,
+)
+from user.serializers import UserSerializer, AuthTokenSerializer
+
+
+class WarmUpTests(TestCase):
+    """test processes are primed before serving"""
+
+    def test_serializers_of_every_view_primed(self):
+        """test the serializers of all actions of all views are built"""
+        primed = warmup.warm_up()
+        for serializer_class in (
+            RecipeSerializer, RecipeDetailSerializer, RecipeImageSerializer,
+            TagSerializer, UserSerializer, AuthTokenSerializer,
+        ):
+            self.assertIn(serializer_class, primed)
+
+    def test_connect(self):
+        """test the connections of the thread are opened"""
+        warmup.connect()
+        from django.db import connection
+        self.assertIsNotNone(connection.connection)
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as request_metrics
+from . import readiness
+
+
+def metrics_allowed(request):
+    """return whether request comes from an allowed address or carries the metrics token"""
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    return bool(settings.METRICS_TOKEN) and scheme.lower() == 'bearer' and (
+        constant_time_compare(token, settings.METRICS_TOKEN)
+    )
+
+
+def metrics(request):
+    """expose the in-process metrics to Prometheus"""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        request_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def healthz(request):
+    """liveness: the process answers, nothing else is checked"""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+def readyz(request):
+    """readiness: the database answers and is fully migrated"""
+    checks = {'database': 'ok', 'migrations': 'ok'}
+    try:
+        readiness.check_database()
+        # reads the migration table, the database may fail here too
+        pending = readiness.pending_migrations()
+    except DatabaseError:
+        checks['database'] = 'unavailable'
+        checks['migrations'] = 'unknown'
+    else:
+        if pending:
+            checks['migrations'] = f'{len(pending)} pending'
+    ready = all(value == 'ok' for value in checks.values())
+    return JsonResponse(checks, status=200 if ready else 503)
@@ -0,0 +1,84 @@
+"""prime a process before it serves traffic
+
+the first request of a fresh process pays for importing views, renderers and
+parsers, building the URL resolver, translation catalogs, serializer fields
+and the database connection. warm_up() does that ahead of time: in the
+gunicorn master with the app preloaded, so that workers inherit it through
+fork, and connect() in each worker.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import translation
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+API_SETTINGS = (
+    'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES',
+    'DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_PERMISSION_CLASSES',
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS', 'DEFAULT_METADATA_CLASS',
+)
+
+
+def _views(resolver):
+    """yield the view callbacks of resolver, populating nested resolvers"""
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _views(pattern)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def _serializer_classes(callback):
+    """return the serializer classes a DRF view uses, per action for viewsets"""
+    cls = getattr(callback, 'cls', None)
+    if cls is None:
+        return set()
+    if not hasattr(cls, 'get_serializer_class'):
+        # plain APIViews such as ObtainAuthToken
+        serializer_class = getattr(cls, 'serializer_class', None)
+        return {serializer_class} if serializer_class else set()
+    actions = getattr(callback, 'actions', None) or {None: None}
+    classes = set()
+    for action in actions.values():
+        view = cls(**getattr(callback, 'initkwargs', {}))
+        view.action = action
+        try:
+            classes.add(view.get_serializer_class())
+        except Exception:
+            # e.g. a view without serializer_class
+            pass
+    return classes
+
+
+def warm_up():
+    """load everything a request needs except the database connection"""
+    for name in API_SETTINGS:
+        getattr(api_settings, name)
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext('authentication failed')
+    translation.deactivate()
+
+    serializer_classes = set()
+    for callback in _views(get_resolver()):
+        serializer_classes |= _serializer_classes(callback)
+    for serializer_class in serializer_classes:
+        # builds the fields from the model's meta
+        serializer_class(context={}).fields
+    logger.info('warmed up %d serializers', len(serializer_classes))
+    return serializer_classes
+
+
+def connect():
+    """open the database connections of this thread"""
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def disconnect():
+    """close them, connections must not be shared with forked children"""
+    connections.close_all()
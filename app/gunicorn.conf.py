@@ -0,0 +1,49 @@
+"""gunicorn settings of the production profile
+
+    gunicorn -c gunicorn.conf.py app.wsgi:application
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn -c gunicorn.conf.py app.asgi:application
+
+the app is loaded and warmed up once in the master (see core.warmup) and the
+workers inherit it through fork; each worker opens its database connection
+before it accepts requests.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+# the usual 2 x cores + 1 for sync workers
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+# recycle workers now and then, jittered so they do not restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+# empty turns the access log off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+
+
+def when_ready(server):
+    from django.conf import settings
+    from core import warmup
+    local = sorted(
+        alias for alias, cache in settings.CACHES.items()
+        if cache['BACKEND'].endswith('LocMemCache')
+    )
+    if workers > 1 and local:
+        server.log.warning(
+            'caches %s are local to each of the %d workers and go stale across '
+            'them, set CACHE_BACKEND and CACHE_LOCATION to a shared cache',
+            ', '.join(local), workers,
+        )
+    warmup.warm_up()
+    # opened by the app checks while loading, if at all
+    warmup.disconnect()
+
+
+def post_fork(server, worker):
+    from core import warmup
+    warmup.connect()
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RecipeConfig(AppConfig):
     name = 'recipe'
+
+    def ready(self):
+        """connect the signal handlers keeping cached data fresh"""
+        from . import signals  # noqa: F401
@@ -0,0 +1,119 @@
+"""bulk creation of recipes for importers
+
+all items are validated first, then every referenced tag and ingredient is
+checked in one query per model and the valid recipes and their M2M rows are
+inserted with bulk_create inside a single transaction.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import status
+
+from core.models import Tag, Ingredient, Recipe
+from .serializers import RecipeBulkItemSerializer
+from .signals import recipes_bulk_created
+
+
+def _owned_ids(model, user, ids):
+    """return which of ids belong to user"""
+    if not ids:
+        return set()
+    return set(
+        model.objects.filter(user=user, id__in=ids).values_list('id', flat=True)
+    )
+
+
+def _insert(recipes):
+    """insert recipes, setting their pk"""
+    if connection.features.can_return_ids_from_bulk_insert:
+        Recipe.objects.bulk_create(
+            recipes, batch_size=_batch_size(Recipe._meta.concrete_fields, recipes)
+        )
+    else:
+        # backends that cannot return the new ids (sqlite) insert one by one
+        for recipe in recipes:
+            recipe.save(force_insert=True)
+
+
+def _batch_size(fields, objs):
+    """return the configured batch size, capped by the backend's limits"""
+    return min(
+        settings.RECIPE_BULK_BATCH_SIZE,
+        max(connection.ops.bulk_batch_size(fields, objs), 1),
+    )
+
+
+def bulk_create_recipes(user, items):
+    """create recipes for user from a list of dicts, return per item results"""
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = RecipeBulkItemSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {
+                'index': index,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'errors': serializer.errors,
+            }
+
+    tag_ids = _owned_ids(
+        Tag, user, {i for _, data in valid for i in data.get('tags', ())}
+    )
+    ingredient_ids = _owned_ids(
+        Ingredient, user, {i for _, data in valid for i in data.get('ingredients', ())}
+    )
+
+    to_create = []
+    for index, data in valid:
+        errors = {}
+        missing = set(data.get('tags', ())) - tag_ids
+        if missing:
+            errors['tags'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing)]
+        missing = set(data.get('ingredients', ())) - ingredient_ids
+        if missing:
+            errors['ingredients'] = [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing)]
+        if errors:
+            results[index] = {
+                'index': index,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'errors': errors,
+            }
+        else:
+            to_create.append((index, data))
+
+    recipes = []
+    if not to_create:
+        return results
+    with transaction.atomic():
+        for index, data in to_create:
+            fields = {k: v for k, v in data.items() if k not in ('tags', 'ingredients')}
+            recipes.append(Recipe(user=user, **fields))
+        _insert(recipes)
+
+        tag_rows = []
+        ingredient_rows = []
+        for recipe, (index, data) in zip(recipes, to_create):
+            tag_rows += [
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=pk)
+                for pk in set(data.get('tags', ()))
+            ]
+            ingredient_rows += [
+                Recipe.ingredients.through(recipe_id=recipe.pk, ingredient_id=pk)
+                for pk in set(data.get('ingredients', ()))
+            ]
+            results[index] = {
+                'index': index,
+                'status': status.HTTP_201_CREATED,
+                'id': recipe.pk,
+            }
+        Recipe.tags.through.objects.bulk_create(
+            tag_rows, batch_size=_batch_size(('recipe_id', 'tag_id'), tag_rows)
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            ingredient_rows, batch_size=_batch_size(('recipe_id', 'ingredient_id'), ingredient_rows)
+        )
+
+    # bulk_create sends no post_save/m2m_changed, tell the receivers instead
+    recipes_bulk_created.send(sender=Recipe, user=user, recipes=recipes)
+    return results
@@ -0,0 +1,85 @@
+"""per user caching of recipe data
+
+everything cached for a user is keyed on their data version, a random token
+replaced by bump_version on every write to their recipes, tags or
+ingredients. Entries of older versions are never read again and expire with
+the TTL, so invalidation is one delete and a cached value can never outlive
+a write. ETags derive from the same version (see recipe.conditional).
+
+only reads from the primary fill the cache: a replica may not have applied
+the write that moved the version yet, and its rows would stay cached under
+the new version.
+"""
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+from core.db import routers
+
+CACHE_ALIAS = 'recipe'
+
+
+def get_cache():
+    """return the cache used for recipe data"""
+    return caches[CACHE_ALIAS]
+
+
+def may_fill():
+    """return whether what this thread reads may be cached, see the module docstring"""
+    return not routers.reading_from_replica()
+
+
+def version_key(user_id):
+    return f'recipe:version:{user_id}'
+
+
+def data_version(user_id):
+    """return the current data version of a user
+
+    read it before the data it versions: a write committing in between then
+    leaves what is cached under it unreachable instead of stale"""
+    cache = get_cache()
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        # kept until the next write, concurrent readers agree on the first one
+        if not cache.add(key, version, None):
+            version = cache.get(key) or version
+    return version
+
+
+def bump_version(user_id):
+    """start a new data version for a user, now and once the transaction commits
+
+    the commit drops whatever readers cached from the pre-commit rows in
+    between, bumping now keeps the writing transaction from reading back
+    what was cached before its write"""
+    cache = get_cache()
+    cache.delete(version_key(user_id))
+    transaction.on_commit(lambda: cache.delete(version_key(user_id)))
+
+
+def attr_list_key(model, user_id, version):
+    """return the key holding every cached list of a model for a user"""
+    return f'recipe:{model._meta.model_name}:lists:{user_id}:{version}'
+
+
+def get_attr_list(model, user_id, version, variant):
+    """return the cached list for a user and variant or None
+
+    version must be read before the data is, see data_version"""
+    lists = get_cache().get(attr_list_key(model, user_id, version)) or {}
+    return lists.get(variant)
+
+
+def set_attr_list(model, user_id, version, variant, data):
+    """cache a list, keeping the other variants of the same user"""
+    if not may_fill():
+        return
+    cache = get_cache()
+    key = attr_list_key(model, user_id, version)
+    lists = cache.get(key) or {}
+    lists[variant] = data
+    cache.set(key, lists)
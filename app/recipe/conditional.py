@@ -0,0 +1,70 @@
+"""conditional GET for the recipe, tag and ingredient endpoints
+
+ETags derive from the user's data version (see recipe.cache), which is read
+from the cache, so an If-None-Match that still matches is answered with 304
+without any query. The cached tag and ingredient lists are keyed on the same
+version, so a body is never sent under the ETag of another version.
+
+bodies read from a replica get no ETag: the replica may lag behind the
+version, and a later 304 would confirm its stale rows.
+"""
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from core.db import routers
+from . import cache
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class ConditionalGetMixin:
+    """answer matching If-None-Match with 304 and tag responses with an ETag"""
+    conditional_actions = ('list', 'retrieve')
+
+    def get_data_version(self):
+        """return the data version of the user, read once per request"""
+        if getattr(self, 'data_version', None) is None:
+            self.data_version = cache.data_version(self.request.user.pk)
+        return self.data_version
+
+    def get_etag(self, request):
+        """return the ETag of this request's response"""
+        parts = (
+            request.user.pk,
+            self.get_data_version(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        return '"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.data_version = None
+        if request.method in ('GET', 'HEAD') and self.action in self.conditional_actions:
+            self.etag = self.get_etag(request)
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+            if if_none_match:
+                etags = parse_etags(if_none_match)
+                if '*' in etags or self.etag in etags:
+                    raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'etag', None)
+        # a 304 sends no body, it only confirms one the primary rendered
+        if response.status_code == status.HTTP_200_OK and routers.reading_from_replica():
+            etag = None
+        if etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+        return response
@@ -0,0 +1,57 @@
+"""Tag.recipe_count and Ingredient.recipe_count
+
+the number of recipes a tag or ingredient is assigned to, stored on its row
+so that assigned_only lists and popularity ordering need neither the M2M
+join nor DISTINCT. recipe.signals recounts the affected rows on every
+change; repair_recipe_counts recounts everything.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import Recipe
+
+
+def through_of(model, recipe_model=Recipe):
+    """return the M2M through model linking recipes to model"""
+    name = 'tags' if model._meta.model_name == 'tag' else 'ingredients'
+    return recipe_model._meta.get_field(name).remote_field.through
+
+
+def counts(model, through):
+    """correlated subquery counting the recipes of the outer model row"""
+    column = model._meta.model_name
+    return Coalesce(Subquery(
+        through.objects.filter(**{column: OuterRef('pk')})
+        .order_by().values(column).annotate(n=Count('recipe')).values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def recount(model, ids=None, through=None):
+    """store the recipe counts of the rows ids of model, all rows when None
+
+    through defaults to the through model of core.models, migrations pass
+    their historical one"""
+    queryset = model.objects.all()
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return 0
+        queryset = queryset.filter(pk__in=ids)
+    return queryset.update(recipe_count=counts(model, through or through_of(model)))
+
+
+def linked_ids(model, recipe_ids):
+    """return the ids of the model rows assigned to any of recipe_ids"""
+    column = f'{model._meta.model_name}_id'
+    return set(
+        through_of(model).objects.filter(recipe_id__in=list(recipe_ids))
+        .values_list(column, flat=True)
+    )
+
+
+def stale(model):
+    """return the rows of model whose stored count is wrong"""
+    return model.objects.annotate(actual=counts(model, through_of(model))).exclude(
+        recipe_count=F('actual')
+    )
@@ -0,0 +1,251 @@
+"""background processing of uploaded recipe images
+
+uploads are validated cheaply in the request, staged to storage and handed to
+a bounded pool of worker threads. Workers decode the image with Pillow, drop
+its metadata, build the bounded-size derivatives and point the recipe at them.
+"""
+import io
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Recipe
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = 'uploads/recipe'
+STAGING_DIR = f'{IMAGE_DIR}/incoming'
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = None
+
+
+class ImageQueueFull(Exception):
+    """raised when too many images are already waiting to be processed"""
+
+
+def get_executor():
+    """return the shared worker pool, created on first use"""
+    global _executor, _pending
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-image',
+            )
+            _pending = threading.BoundedSemaphore(settings.RECIPE_IMAGE_MAX_PENDING)
+    return _executor
+
+
+def validate_upload(upload):
+    """return a list of problems with an upload, checked without decoding it"""
+    errors = []
+    if upload.size > settings.RECIPE_IMAGE_MAX_UPLOAD_BYTES:
+        errors.append(
+            f'image is larger than {settings.RECIPE_IMAGE_MAX_UPLOAD_BYTES} bytes'
+        )
+    # set by the image field after Image.verify(), only the header was read
+    image = getattr(upload, 'image', None)
+    if image is not None:
+        width, height = image.size
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            errors.append(
+                f'image is larger than {settings.RECIPE_IMAGE_MAX_PIXELS} pixels'
+            )
+    return errors
+
+
+def schedule(recipe, upload):
+    """stage an upload and process it in the background
+
+    runs inline when RECIPE_IMAGE_ASYNC is off, raises ImageQueueFull when
+    the pool is saturated"""
+    if settings.RECIPE_IMAGE_ASYNC:
+        get_executor()
+        # only check for a free slot: it is taken once the transaction
+        # commits, a rollback would never give back a slot taken now
+        if not _pending.acquire(blocking=False):
+            raise ImageQueueFull()
+        _pending.release()
+    ext = os.path.splitext(upload.name)[1].lower()
+    staged = default_storage.save(f'{STAGING_DIR}/{uuid.uuid4()}{ext}', upload)
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image_status=Recipe.IMAGE_PROCESSING, updated_at=timezone.now()
+    )
+    cache.bump_version(recipe.user_id)
+    recipe.image_status = Recipe.IMAGE_PROCESSING
+
+    if not settings.RECIPE_IMAGE_ASYNC:
+        process_image(recipe.pk, staged)
+        recipe.refresh_from_db()
+        return
+
+    def submit():
+        if not _pending.acquire(blocking=False):
+            # the pool filled up since the request was accepted
+            logger.warning('image queue full, dropping the image of recipe %s', recipe.pk)
+            _mark_failed(recipe.pk)
+            default_storage.delete(staged)
+            return
+        future = get_executor().submit(_run_in_worker, recipe.pk, staged)
+        future.add_done_callback(lambda f: _pending.release())
+
+    # the worker uses its own connection, it must see the committed row
+    transaction.on_commit(submit)
+
+
+def _run_in_worker(recipe_id, staged):
+    try:
+        process_image(recipe_id, staged)
+    finally:
+        connection.close()
+
+
+# EXIF orientation -> transpose bringing the pixels upright
+ORIENTATION_TAG = 0x0112
+ORIENTATIONS = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+def _upright(image):
+    """apply the EXIF orientation, which is dropped with the rest of the metadata
+
+    Pillow 5.3 has no ImageOps.exif_transpose"""
+    get_exif = getattr(image, '_getexif', None)
+    try:
+        exif = get_exif() if get_exif else None
+    except Exception:
+        # unreadable metadata, keep the pixels as they are
+        exif = None
+    method = ORIENTATIONS.get((exif or {}).get(ORIENTATION_TAG))
+    return image.transpose(method) if method is not None else image
+
+
+def _pixels(image, mode):
+    """return the pixels of image in mode, in a new image with empty info
+
+    Pillow versions differ in which of image.info (comment, exif, icc_profile)
+    they write back on save, an image built from bare pixels has none"""
+    image = image.convert(mode)
+    return Image.frombytes(mode, image.size, image.tobytes())
+
+
+def _encode(image, max_size):
+    """return a metadata free copy of image fitting in max_size, and its extension"""
+    image = image.copy()
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        _pixels(image, 'RGBA').save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue(), 'png'
+    _pixels(image, 'RGB').save(buffer, format='JPEG', quality=85, optimize=True)
+    return buffer.getvalue(), 'jpg'
+
+
+def process_image(recipe_id, staged):
+    """build the derivatives of a staged upload and attach them to the recipe"""
+    try:
+        with default_storage.open(staged) as f:
+            source = Image.open(f)
+            source.load()
+        source = _upright(source)
+        recipe = Recipe.objects.get(pk=recipe_id)
+        for field, max_size in (
+            ('image', settings.RECIPE_IMAGE_MAX_SIZE),
+            ('image_thumbnail', settings.RECIPE_IMAGE_THUMBNAIL_SIZE),
+        ):
+            data, ext = _encode(source, max_size)
+            getattr(recipe, field).save(f'{field}.{ext}', ContentFile(data), save=False)
+        # only touch the image columns, the recipe may be edited meanwhile
+        Recipe.objects.filter(pk=recipe_id).update(
+            image=recipe.image.name,
+            image_thumbnail=recipe.image_thumbnail.name,
+            image_status=Recipe.IMAGE_READY,
+            updated_at=timezone.now(),
+        )
+        cache.bump_version(recipe.user_id)
+    except Recipe.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception('processing image of recipe %s failed', recipe_id)
+        _mark_failed(recipe_id)
+    finally:
+        default_storage.delete(staged)
+
+
+def _mark_failed(recipe_id):
+    user_id = Recipe.objects.filter(pk=recipe_id).values_list('user_id', flat=True).first()
+    Recipe.objects.filter(pk=recipe_id).update(
+        image_status=Recipe.IMAGE_FAILED, updated_at=timezone.now()
+    )
+    if user_id is not None:
+        cache.bump_version(user_id)
+
+
+def image_storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def references():
+    """return how many recipe image columns point at each stored file"""
+    counts = Counter()
+    rows = Recipe.objects.values_list('image', 'image_thumbnail').iterator()
+    for row in rows:
+        counts.update(name for name in row if name)
+    return counts
+
+
+def stored_files(storage, directory=IMAGE_DIR, exclude=(STAGING_DIR,)):
+    """yield the names of every file below directory, outside of exclude"""
+    if directory in exclude or not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield f'{directory}/{name}'
+    for name in directories:
+        yield from stored_files(storage, f'{directory}/{name}', exclude)
+
+
+def orphans(grace):
+    """yield the stored image files no recipe uses, untouched for grace
+
+    the grace period spares files a worker has just written or reused and
+    not yet pointed a recipe at. Staged uploads are in default_storage, not
+    in the image storage, see stale_uploads()"""
+    storage = image_storage()
+    used = references()
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    for name in stored_files(storage):
+        if name not in used and storage.get_modified_time(name) < cutoff:
+            yield name
+
+
+def stale_uploads(grace):
+    """yield the staged uploads untouched for grace
+
+    workers delete the uploads they process, the ones left behind belong to
+    jobs that never ran (a crash or a lost worker)"""
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    for name in stored_files(default_storage, STAGING_DIR, exclude=()):
+        if default_storage.get_modified_time(name) < cutoff:
+            yield name
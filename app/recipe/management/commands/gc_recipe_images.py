@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipe import images
+
+
+class Command(BaseCommand):
+    """delete stored recipe images that no recipe references, and abandoned uploads"""
+    help = 'delete recipe image files no recipe uses anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only report the files that would be deleted')
+        parser.add_argument('--grace', type=int, default=24 * 3600,
+                            help='keep unreferenced files modified in the last GRACE seconds')
+
+    def collect(self, storage, names, dry_run):
+        """delete names from storage, return their count and size"""
+        count = size = 0
+        for name in names:
+            count += 1
+            size += storage.size(name)
+            if not dry_run:
+                storage.delete(name)
+        return count, size
+
+    def handle(self, *args, **options):
+        verb = 'found' if options['dry_run'] else 'deleted'
+        count, size = self.collect(
+            images.image_storage(), images.orphans(options['grace']), options['dry_run']
+        )
+        self.stdout.write(f'orphaned images: {count} {verb}, {size} bytes')
+        count, size = self.collect(
+            default_storage, images.stale_uploads(options['grace']), options['dry_run']
+        )
+        self.stdout.write(f'stale uploads: {count} {verb}, {size} bytes')
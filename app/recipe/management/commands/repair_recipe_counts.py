@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Tag, Ingredient
+from recipe import cache, counts
+
+
+class Command(BaseCommand):
+    """recount Tag.recipe_count and Ingredient.recipe_count"""
+    help = 'fix stored recipe counts of tags and ingredients that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only report the rows that are wrong')
+
+    def handle(self, *args, **options):
+        for model in (Tag, Ingredient):
+            stale = list(counts.stale(model).values_list('id', 'user_id'))
+            if stale and not options['dry_run']:
+                counts.recount(model, [pk for pk, user_id in stale])
+                for user_id in {user_id for pk, user_id in stale}:
+                    cache.bump_version(user_id)
+            verb = 'wrong' if options['dry_run'] else 'fixed'
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {len(stale)} {verb}'
+            )
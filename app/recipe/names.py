@@ -0,0 +1,50 @@
+"""get or create tags and ingredients of a user by name
+
+recipe writes may name their tags and ingredients instead of sending ids.
+Known names are found with one query per model, the missing ones are
+created with one bulk_create. Tag and ingredient names are not unique in
+the database, so concurrent writers creating names for the same user are
+serialized on a lock of the user row, taken only when something is missing.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from . import cache
+
+
+def clean(names):
+    """strip names, dropping blanks and duplicates but keeping their order"""
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+def _find(model, user, names):
+    found = {}
+    for obj in model.objects.filter(user=user, name__in=names).order_by('id'):
+        found.setdefault(obj.name, obj)
+    return found
+
+
+def get_or_create(model, user, names):
+    """return the objects of user named names, creating the missing ones"""
+    names = clean(names)
+    if not names:
+        return []
+    with transaction.atomic():
+        found = _find(model, user, names)
+        missing = [name for name in names if name not in found]
+        if missing:
+            get_user_model().objects.select_for_update().filter(pk=user.pk).first()
+            # another writer may have created them while we waited for the lock
+            found.update(_find(model, user, missing))
+            missing = [name for name in missing if name not in found]
+        if missing:
+            created = model.objects.bulk_create(
+                [model(user=user, name=name) for name in missing]
+            )
+            if not connection.features.can_return_ids_from_bulk_insert:
+                # sqlite: bulk_create leaves the new objects without a pk
+                created = _find(model, user, missing).values()
+            found.update((obj.name, obj) for obj in created)
+            # bulk_create sends no post_save
+            cache.bump_version(user.pk)
+    return [found[name] for name in names]
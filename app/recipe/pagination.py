@@ -0,0 +1,148 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class KeysetPagination(CursorPagination):
+    """cursor pagination seeking on an indexed ordering instead of OFFSET
+
+    the cursor position holds the values of every ordering column, and a page
+    starts right after that row in the full ordering. CursorPagination seeks
+    on the first column only and skips rows sharing its value with OFFSET,
+    which grows without bound on ties (e.g. ordering by recipe_count).
+
+    pagination is opt-in: clients that send neither `cursor` nor `page_size`
+    keep getting the plain list, unless API_ALWAYS_PAGINATE is set"""
+    page_size_query_param = 'page_size'
+    ordering = ('id',)
+
+    def get_page_size(self, request):
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
+        self.page_size = settings.API_PAGE_SIZE
+        return super().get_page_size(request)
+
+    def get_ordering(self, request, queryset, view):
+        """the view's list_ordering() when it has one, ids last"""
+        if hasattr(view, 'list_ordering'):
+            return view.list_ordering()[1]
+        return self.ordering
+
+    def is_requested(self, request):
+        """return True when this request gets a paginated response"""
+        return settings.API_ALWAYS_PAGINATE or (
+            self.cursor_query_param in request.query_params or
+            self.page_size_query_param in request.query_params
+        )
+
+    def position_value(self, queryset, name, value):
+        """return the cursor value of column name as the column's type
+
+        cursors come from clients, anything no row could hold is an invalid cursor"""
+        if value is None or isinstance(value, (list, dict)):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = queryset.query.annotations[name].output_field
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        # ids have no validators, keep them in what any backend can compare
+        if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+            raise NotFound(self.invalid_cursor_message)
+        return value
+
+    def seek(self, queryset, position, reverse):
+        """keep the rows after position in the ordering, before it when reverse
+
+        (a, b, c) > (va, vb, vc) spelled out column by column, so each column
+        keeps its own direction"""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        after = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            name = order.lstrip('-')
+            value = self.position_value(queryset, name, value)
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            after |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return queryset.filter(after)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            name = order.lstrip('-')
+            values.append(instance[name] if isinstance(instance, dict) else getattr(instance, name))
+        return json.dumps(values, default=str, separators=(',', ':'))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """CursorPagination.paginate_queryset, seeking on the whole ordering"""
+        if not self.is_requested(request):
+            return None
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = self.seek(queryset, current_position, reverse)
+
+        # positions are unique, so the offset only comes from hand-made cursors
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class NameKeysetPagination(KeysetPagination):
+    """keyset pagination for objects listed by name, or by the view's list_ordering()"""
+    ordering = ('name', 'id')
@@ -0,0 +1,60 @@
+"""related fields limited to the objects of the requesting user
+
+PrimaryKeyRelatedField(many=True) looks every id up with its own query,
+against the whole table. OwnedPrimaryKeyRelatedField only accepts objects
+of request.user and, with many=True, checks all ids in one id__in query.
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class OwnedManyRelatedField(serializers.ManyRelatedField):
+    """validate a list of primary keys with a single query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pk_field = child.get_queryset().model._meta.pk
+        errors = []
+        pks = []
+        for item in data:
+            try:
+                if isinstance(item, (list, dict)):
+                    raise TypeError
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                errors.append(child.error_messages['incorrect_type'].format(
+                    data_type=type(item).__name__
+                ))
+        found = child.get_queryset().in_bulk(set(pks))
+        errors += [
+            child.error_messages['does_not_exist'].format(pk_value=pk)
+            for pk in dict.fromkeys(pks) if pk not in found
+        ]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [found[pk] for pk in pks]
+
+
+class OwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """primary key field limited to the objects of request.user"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return OwnedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated:
+            queryset = queryset.filter(user=request.user)
+        return queryset
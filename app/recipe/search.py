@@ -0,0 +1,77 @@
+"""full-text search over recipe titles, tag names and ingredient names
+
+on PostgreSQL every recipe keeps a weighted tsvector (title A, tags B,
+ingredients C) in Recipe.search_vector, matched through a GIN index and
+ranked with ts_rank. Other databases (sqlite in tests) fall back to
+case-insensitive substring matching.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, IntegerField, Q, Value
+from django.db.models.functions import Cast
+
+from core.models import Recipe, Tag, Ingredient
+
+SEARCH_CONFIG = 'english'
+# ts_rank is a float4 that does not survive a round trip through a cursor,
+# ranks are scaled to integers so pages can seek on them exactly
+RANK_SCALE = 1000000
+
+_UPDATE_SQL = """
+UPDATE {recipe} SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, {recipe}.title), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(t.name, ' ') FROM {tag} t
+        JOIN {recipe_tags} rt ON rt.tag_id = t.id
+        WHERE rt.recipe_id = {recipe}.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(i.name, ' ') FROM {ingredient} i
+        JOIN {recipe_ingredients} ri ON ri.ingredient_id = i.id
+        WHERE ri.recipe_id = {recipe}.id
+    ), '')), 'C')
+""".format(
+    recipe=Recipe._meta.db_table,
+    tag=Tag._meta.db_table,
+    ingredient=Ingredient._meta.db_table,
+    recipe_tags=Recipe.tags.through._meta.db_table,
+    recipe_ingredients=Recipe.ingredients.through._meta.db_table,
+)
+
+
+def is_supported(conn=connection):
+    """return whether the database keeps search vectors"""
+    return conn.vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids=None, conn=connection):
+    """recompute the search vector of the given recipes, or of every recipe"""
+    if not is_supported(conn):
+        return
+    sql = _UPDATE_SQL
+    params = {'config': SEARCH_CONFIG}
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        sql += f'WHERE {Recipe._meta.db_table}.id = ANY(%(ids)s)'
+        params['ids'] = recipe_ids
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def search_recipes(queryset, term):
+    """filter queryset to recipes matching term, best matches first"""
+    if is_supported():
+        query = SearchQuery(term, config=SEARCH_CONFIG)
+        rank = SearchRank(F('search_vector'), query) * Value(RANK_SCALE, output_field=FloatField())
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(rank, IntegerField())
+        ).order_by('-rank', 'id')
+    matching = Recipe.objects.filter(
+        Q(title__icontains=term) |
+        Q(tags__name__icontains=term) |
+        Q(ingredients__name__icontains=term)
+    ).values('id')
+    # a subquery so recipes matching several ways are not duplicated
+    return queryset.filter(id__in=matching)
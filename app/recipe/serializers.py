@@ -1,5 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
 from core.models import Tag, Ingredient, Recipe
+from . import images, names
+from .relations import OwnedPrimaryKeyRelatedField
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -20,25 +23,131 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    ingredients = serializers.PrimaryKeyRelatedField(many=True, queryset=Ingredient.objects.all())
-    tags = serializers.PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
+class SparseFieldsMixin:
+    """let callers pick the fields to render and which relations to nest
+
+    `fields` keeps only the named fields, `expand` replaces the named
+    relations with their expandable_fields serializer"""
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+        for name in expand or ():
+            if name in self.fields:
+                self.fields[name] = self.expandable_fields[name](many=True, read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # required unless named in tag_names/ingredient_names, see validate()
+    ingredients = OwnedPrimaryKeyRelatedField(
+        many=True, queryset=Ingredient.objects.all(), required=False
+    )
+    tags = OwnedPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all(), required=False)
+    # names of tags/ingredients to assign, created when the user has none by that name
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255), write_only=True, required=False
+    )
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255), write_only=True, required=False
+    )
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'title', 'ingredients', 'tags',
-            'time_minutes','price', 'link'
+            'time_minutes','price', 'link',
+            'ingredient_names', 'tag_names',
         )
         read_only_fields = ('id',)
 
+    # the fields of a rendered recipe, loaded by the list and detail views
+    rendered_fields = tuple(f for f in Meta.fields if not f.endswith('_names'))
+
+    expandable_fields = {
+        'ingredients': IngredientSerializer,
+        'tags': TagSerializer,
+    }
+
+    def validate(self, attrs):
+        """require tags and ingredients on create and full update, by ids or names"""
+        if not self.partial:
+            missing = {
+                field: [self.fields[field].error_messages['required']]
+                for field in ('tags', 'ingredients')
+                if field not in attrs and f'{field[:-1]}_names' not in attrs
+            }
+            if missing:
+                raise serializers.ValidationError(missing)
+        return attrs
+
+    def resolve_names(self, validated_data, user, instance=None):
+        """add the tags/ingredients named in validated_data to its id lists
+
+        names add to the ids sent along; when an update sends no ids they
+        add to the recipe's current tags/ingredients instead of replacing them"""
+        for field, model in (('tags', Tag), ('ingredients', Ingredient)):
+            if f'{field[:-1]}_names' not in validated_data:
+                continue
+            named = names.get_or_create(model, user, validated_data.pop(f'{field[:-1]}_names'))
+            if field in validated_data:
+                objs = validated_data[field]
+            elif instance is not None:
+                objs = list(getattr(instance, field).all())
+            else:
+                objs = []
+            validated_data[field] = objs + [obj for obj in named if obj not in objs]
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            self.resolve_names(validated_data, validated_data['user'])
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self.resolve_names(validated_data, instance.user, instance)
+            return super().update(instance, validated_data)
+
+
+class RecipeBulkItemSerializer(serializers.ModelSerializer):
+    """serializer validating one recipe of a bulk import
+
+    tag and ingredient ids are only type checked here, recipe.bulk checks
+    them for every item at once"""
+    ingredients = serializers.ListField(child=serializers.IntegerField(), required=False)
+    tags = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'title', 'ingredients', 'tags',
+            'time_minutes', 'price', 'link'
+        )
+
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """serializer for uploading image to a serializer"""
     class Meta:
         model = Recipe
-        fields = ('id', 'image', )
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_thumbnail', 'image_status')
+        read_only_fields = ('id', 'image_thumbnail', 'image_status')
+        extra_kwargs = {'image': {'required': True, 'allow_null': False}}
+
+    def validate_image(self, value):
+        """reject uploads too big to process, before anything is decoded"""
+        errors = images.validate_upload(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
+    def update(self, instance, validated_data):
+        """hand the upload to the image workers instead of saving it as is"""
+        images.schedule(instance, validated_data['image'])
+        return instance
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -0,0 +1,145 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+from . import cache, counts, search
+
+M2M_WRITE_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+# sent by recipe.bulk once recipes and their tags/ingredients were inserted
+# with bulk_create, which sends neither post_save nor m2m_changed
+recipes_bulk_created = Signal(providing_args=['user', 'recipes'])
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+def bump_version_on_write(sender, instance, **kwargs):
+    """a written recipe, tag or ingredient outdates everything cached for its user"""
+    cache.bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_version_on_assign(sender, instance, action, **kwargs):
+    """(un)assigning changes recipes and the assigned_only/popular lists"""
+    if action in M2M_WRITE_ACTIONS:
+        cache.bump_version(instance.user_id)
+
+
+@receiver(recipes_bulk_created)
+def bump_version_on_bulk_create(sender, user, **kwargs):
+    cache.bump_version(user.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector_on_save(sender, instance, **kwargs):
+    """the title is part of the search vector"""
+    search.update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_search_vector_on_assign(sender, instance, action, reverse, pk_set, **kwargs):
+    """tag and ingredient names are part of the search vector"""
+    if not search.is_supported():
+        return
+    if not reverse:
+        if action in M2M_WRITE_ACTIONS:
+            search.update_search_vectors([instance.pk])
+    elif action == 'pre_clear':
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        search.update_search_vectors(instance.__dict__.pop('_search_recipe_ids', ()))
+    elif action in M2M_WRITE_ACTIONS:
+        search.update_search_vectors(pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_recipes_on_attr_delete(sender, instance, **kwargs):
+    """the links to recipes are gone once the tag/ingredient is deleted"""
+    if search.is_supported():
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_search_vector_on_rename(sender, instance, created=False, **kwargs):
+    """renaming or deleting a tag/ingredient changes its recipes' vectors"""
+    if created or not search.is_supported():
+        return
+    recipe_ids = instance.__dict__.pop('_search_recipe_ids', None)
+    if recipe_ids is None:
+        recipe_ids = instance.recipe_set.values_list('id', flat=True)
+    search.update_search_vectors(recipe_ids)
+
+
+@receiver(recipes_bulk_created)
+def update_search_vector_on_bulk_create(sender, recipes, **kwargs):
+    """bulk inserted recipes start without a search vector"""
+    search.update_search_vectors(r.pk for r in recipes)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe_on_assign(sender, instance, action, reverse, pk_set, **kwargs):
+    """(un)assigning tags or ingredients is a write to the recipe"""
+    if action not in M2M_WRITE_ACTIONS:
+        return
+    now = timezone.now()
+    if not reverse:
+        Recipe.objects.filter(pk=instance.pk).update(updated_at=now)
+    elif pk_set:
+        Recipe.objects.filter(pk__in=pk_set).update(updated_at=now)
+    else:
+        # reverse clear, the tag/ingredient row itself is touched instead
+        type(instance).objects.filter(pk=instance.pk).update(updated_at=now)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recount_on_assign(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """(un)assigning changes the recipe count of the tags/ingredients involved"""
+    if reverse:
+        # instance is the tag/ingredient itself
+        if action in M2M_WRITE_ACTIONS:
+            counts.recount(type(instance), [instance.pk])
+    elif action == 'pre_clear':
+        instance.__dict__.setdefault('_count_ids', {})[model] = counts.linked_ids(
+            model, [instance.pk]
+        )
+    elif action == 'post_clear':
+        counts.recount(model, instance.__dict__.get('_count_ids', {}).pop(model, ()))
+    elif action in M2M_WRITE_ACTIONS:
+        counts.recount(model, pk_set)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_counted_on_recipe_delete(sender, instance, **kwargs):
+    """the links of the recipe are gone once it is deleted"""
+    instance._count_ids = {
+        model: counts.linked_ids(model, [instance.pk]) for model in (Tag, Ingredient)
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def recount_on_recipe_delete(sender, instance, **kwargs):
+    """deleting a recipe unassigns its tags and ingredients"""
+    for model, ids in instance.__dict__.pop('_count_ids', {}).items():
+        counts.recount(model, ids)
+
+
+@receiver(recipes_bulk_created)
+def recount_on_bulk_create(sender, recipes, **kwargs):
+    """imported recipes are assigned without m2m_changed"""
+    recipe_ids = [r.pk for r in recipes]
+    for model in (Tag, Ingredient):
+        counts.recount(model, counts.linked_ids(model, recipe_ids))
@@ -0,0 +1,89 @@
+"""per user recipe statistics for the dashboard
+
+totals (count, price and time sums, time histogram) come from one aggregate
+query, the top tags and ingredients from their recipe_count index. Both are
+cached under the user's data version (see recipe.cache), so any committed
+write to their recipes, tags or ingredients recomputes them on the next read.
+Reads from a replica are not cached.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+
+from core.models import Tag, Ingredient, Recipe
+from . import cache
+
+# lower bounds of the time_minutes histogram buckets after the first
+TIME_BUCKETS = (15, 30, 60, 120)
+TOP = 5
+TOP_VARIANT = 'stats:top'
+
+
+def totals_key(user_id, version):
+    return f'recipe:stats:{user_id}:{version}'
+
+
+def compute_totals(user):
+    """aggregate the recipes of user in a single query"""
+    bounds = (0,) + TIME_BUCKETS + (None,)
+    buckets = {}
+    for i, (low, high) in enumerate(zip(bounds, bounds[1:])):
+        condition = Q(time_minutes__gte=low)
+        if high is not None:
+            condition &= Q(time_minutes__lt=high)
+        buckets[f'bucket_{i}'] = Count('id', filter=condition)
+    row = Recipe.objects.filter(user=user).aggregate(
+        count=Count('id'), price_sum=Sum('price'), time_sum=Sum('time_minutes'), **buckets
+    )
+    return {
+        'count': row['count'],
+        'price_sum': str(row['price_sum'] or Decimal('0')),
+        'time_sum': row['time_sum'] or 0,
+        'histogram': [row[f'bucket_{i}'] for i in range(len(TIME_BUCKETS) + 1)],
+    }
+
+
+def get_totals(user, version):
+    stats_cache = cache.get_cache()
+    totals = stats_cache.get(totals_key(user.pk, version))
+    if totals is None:
+        totals = compute_totals(user)
+        if cache.may_fill():
+            stats_cache.set(totals_key(user.pk, version), totals)
+    return totals
+
+
+def get_top(model, user, version):
+    """return the most used tags or ingredients of user"""
+    top = cache.get_attr_list(model, user.pk, version, TOP_VARIANT)
+    if top is None:
+        top = list(
+            model.objects.filter(user=user, recipe_count__gt=0)
+            .order_by('-recipe_count', 'name')
+            .values('id', 'name', 'recipe_count')[:TOP]
+        )
+        cache.set_attr_list(model, user.pk, version, TOP_VARIANT, top)
+    return top
+
+
+def get_stats(user):
+    """return the dashboard statistics of user"""
+    # read before the data, a write committing meanwhile outdates this version
+    version = cache.data_version(user.pk)
+    totals = get_totals(user, version)
+    count = totals['count']
+    bounds = (0,) + TIME_BUCKETS + (None,)
+    return {
+        'count': count,
+        'avg_price': (
+            str((Decimal(totals['price_sum']) / count).quantize(Decimal('0.01')))
+            if count else None
+        ),
+        'avg_time_minutes': round(totals['time_sum'] / count, 1) if count else None,
+        'time_histogram': [
+            {'min_minutes': low, 'max_minutes': high - 1 if high else None, 'count': n}
+            for low, high, n in zip(bounds, bounds[1:], totals['histogram'])
+        ],
+        'top_tags': get_top(Tag, user, version),
+        'top_ingredients': get_top(Ingredient, user, version),
+    }
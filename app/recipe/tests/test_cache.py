@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import reverse
+from django.test import TestCase, TransactionTestCase
+
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import cache, names
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+class AttrListCacheTests(TestCase):
+    """test tag and ingredient lists are cached and invalidated"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="soup",
+            time_minutes=10,
+            price=4
+        )
+
+    def test_list_served_from_cache(self):
+        """test a repeated list runs no query"""
+        Tag.objects.create(user=self.user, name="vegan")
+        self.client.get(TAGS_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL)
+        self.assertEqual(res.data[0]['name'], 'vegan')
+
+    def test_cache_per_user(self):
+        """test users do not see each other cached lists"""
+        Tag.objects.create(user=self.user, name="vegan")
+        self.client.get(TAGS_URL)
+        user2 = get_user_model().objects.create(
+            email="test2@gmail.com",
+            password="password123"
+        )
+        self.client.force_authenticate(user2)
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(len(res.data), 0)
+
+    def test_create_invalidates(self):
+        """test creating or deleting a tag refreshes the list"""
+        self.client.get(TAGS_URL)
+        tag = Tag.objects.create(user=self.user, name="vegan")
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(len(res.data), 1)
+        tag.delete()
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(len(res.data), 0)
+
+    def test_assignment_invalidates_assigned_only(self):
+        """test assigning and unassigning refreshes assigned_only lists"""
+        ingredient = Ingredient.objects.create(user=self.user, name="salt")
+        res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data), 0)
+        self.recipe.ingredients.add(ingredient)
+        res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data), 1)
+        self.recipe.ingredients.clear()
+        res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data), 0)
+
+    def test_recipe_delete_invalidates(self):
+        """test deleting a recipe unassigns its tags in cached lists"""
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name="vegan"))
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data), 1)
+        self.recipe.delete()
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data), 0)
+
+    def test_write_starts_new_version(self):
+        """test the data version is stable until the user writes"""
+        version = cache.data_version(self.user.pk)
+        self.assertEqual(cache.data_version(self.user.pk), version)
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name="vegan"))
+        self.assertNotEqual(cache.data_version(self.user.pk), version)
+
+    def test_lost_version_never_reused(self):
+        """test an evicted version is replaced by a new one"""
+        version = cache.data_version(self.user.pk)
+        cache.get_cache().delete(cache.version_key(self.user.pk))
+        self.assertNotEqual(cache.data_version(self.user.pk), version)
+
+
+class AttrListCacheCommitTests(TransactionTestCase):
+    """test lists cached while a write was uncommitted are dropped on commit"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_commit_bumps_version(self):
+        with transaction.atomic():
+            Tag.objects.create(user=self.user, name="vegan")
+            # another connection still reads the empty list and caches it
+            version = cache.data_version(self.user.pk)
+            cache.set_attr_list(Tag, self.user.pk, version, 'all:name', [])
+
+        self.assertNotEqual(cache.data_version(self.user.pk), version)
+        res = self.client.get(TAGS_URL)
+        self.assertEqual([t['name'] for t in res.data], ['vegan'])
+
+    def test_commit_of_named_tags_bumps_version(self):
+        """test tags created by name in bulk are listed once committed"""
+        with transaction.atomic():
+            names.get_or_create(Tag, self.user, ['vegan'])
+            version = cache.data_version(self.user.pk)
+            cache.set_attr_list(Tag, self.user.pk, version, 'all:name', [])
+
+        res = self.client.get(TAGS_URL)
+        self.assertEqual([t['name'] for t in res.data], ['vegan'])
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ConditionalGetTests(TestCase):
+    """test ETag / If-None-Match handling of the recipe endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="soup", time_minutes=5, price=2
+        )
+        self.tag = Tag.objects.create(user=self.user, name="vegan")
+
+    def assertNotModified(self, url, etag, **params):
+        res = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def assertModified(self, url, etag, **params):
+        res = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_not_modified_skips_list_query(self):
+        """test a matching ETag is answered without any query"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        with self.assertNumQueries(0):
+            self.assertNotModified(RECIPE_URL, etag)
+        self.assertNotModified(RECIPE_URL, f'"other", {etag}')
+
+    def test_etag_depends_on_query(self):
+        """test filtered lists and details get their own ETags"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        self.assertModified(RECIPE_URL, etag, tags=str(self.tag.id))
+        detail = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        self.assertModified(detail, etag)
+
+    def test_writes_change_etag(self):
+        """test creating, updating, assigning and deleting change the ETag"""
+        writes = (
+            lambda: Recipe.objects.create(user=self.user, title="stew", time_minutes=5, price=2),
+            lambda: self.client.patch(
+                reverse('recipe:recipe-detail', args=[self.recipe.id]), {'title': 'pho'}
+            ),
+            lambda: self.recipe.tags.add(self.tag),
+            lambda: Tag.objects.filter(pk=self.tag.pk).first().delete(),
+            lambda: self.recipe.delete(),
+        )
+        for write in writes:
+            etag = self.client.get(RECIPE_URL)['ETag']
+            write()
+            self.assertModified(RECIPE_URL, etag)
+
+    def test_tag_rename_changes_tag_etag(self):
+        """test tag lists are revalidated after a rename"""
+        etag = self.client.get(TAGS_URL)['ETag']
+        self.assertNotModified(TAGS_URL, etag)
+        self.tag.name = "vegetarian"
+        self.tag.save()
+        self.assertModified(TAGS_URL, etag)
+
+    def test_etag_per_user(self):
+        """test another user's ETag never matches"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        user2 = get_user_model().objects.create(email="test2@gmail.com")
+        self.client.force_authenticate(user2)
+        self.assertModified(RECIPE_URL, etag)
@@ -0,0 +1,153 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import bulk
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def counts(*objs):
+    return [type(obj).objects.get(pk=obj.pk).recipe_count for obj in objs]
+
+
+class RecipeCountTests(TestCase):
+    """test the stored recipe counts of tags and ingredients"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+        self.vegan = Tag.objects.create(user=self.user, name='vegan')
+        self.quick = Tag.objects.create(user=self.user, name='quick')
+        self.salt = Ingredient.objects.create(user=self.user, name='salt')
+        self.soup = self.recipe('soup')
+        self.stew = self.recipe('stew')
+
+    def recipe(self, title):
+        return Recipe.objects.create(user=self.user, title=title, time_minutes=5, price=1)
+
+    def test_counts_follow_assignment(self):
+        """test adding, removing and clearing from both sides recounts"""
+        self.soup.tags.add(self.vegan, self.quick)
+        self.stew.tags.add(self.vegan)
+        self.assertEqual(counts(self.vegan, self.quick), [2, 1])
+        self.soup.tags.remove(self.quick)
+        self.assertEqual(counts(self.vegan, self.quick), [2, 0])
+        self.soup.tags.clear()
+        self.assertEqual(counts(self.vegan), [1])
+
+        self.salt.recipe_set.add(self.soup, self.stew)
+        self.assertEqual(counts(self.salt), [2])
+        self.salt.recipe_set.clear()
+        self.assertEqual(counts(self.salt), [0])
+
+    def test_recipe_delete_recounts(self):
+        """test deleting a recipe unassigns its tags and ingredients"""
+        self.soup.tags.add(self.vegan)
+        self.soup.ingredients.add(self.salt)
+        self.soup.delete()
+        self.assertEqual(counts(self.vegan, self.salt), [0, 0])
+
+    def test_bulk_create_recounts(self):
+        """test recipes imported in bulk are counted"""
+        bulk.bulk_create_recipes(self.user, [
+            {'title': 'a', 'time_minutes': 1, 'price': '1.00', 'tags': [self.vegan.id]},
+            {'title': 'b', 'time_minutes': 1, 'price': '1.00', 'tags': [self.vegan.id],
+             'ingredients': [self.salt.id]},
+        ])
+        self.assertEqual(counts(self.vegan, self.quick, self.salt), [2, 0, 1])
+
+    def test_repair_command(self):
+        """test drifted counts are found and fixed"""
+        self.soup.tags.add(self.vegan)
+        Tag.objects.filter(pk=self.vegan.pk).update(recipe_count=7)
+        Tag.objects.filter(pk=self.quick.pk).update(recipe_count=3)
+        out = StringIO()
+        call_command('repair_recipe_counts', '--dry-run', stdout=out)
+        self.assertIn('tags: 2 wrong', out.getvalue())
+        self.assertEqual(counts(self.vegan), [7])
+        call_command('repair_recipe_counts', stdout=out)
+        self.assertEqual(counts(self.vegan, self.quick), [1, 0])
+        self.assertIn('ingredients: 0 fixed', out.getvalue())
+
+
+class CountedListTests(TestCase):
+    """test lists use the stored recipe counts"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rare = Tag.objects.create(user=self.user, name='a rare')
+        self.popular = Tag.objects.create(user=self.user, name='b popular')
+        Tag.objects.create(user=self.user, name='c unused')
+        for title in ('soup', 'stew'):
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=1
+            )
+            recipe.tags.add(self.popular)
+        recipe.tags.add(self.rare)
+
+    def test_assigned_only_without_join(self):
+        """test assigned_only filters on the count, without join or DISTINCT"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual([t['name'] for t in res.data], ['a rare', 'b popular'])
+        sql = ctx.captured_queries[-1]['sql']
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('JOIN', sql)
+
+    def test_popular_ordering(self):
+        """test tags can be listed most used first, also paginated"""
+        res = self.client.get(TAGS_URL, {'ordering': 'popular'})
+        self.assertEqual(
+            [t['name'] for t in res.data], ['b popular', 'a rare', 'c unused']
+        )
+        res = self.client.get(TAGS_URL, {'ordering': 'popular', 'page_size': 2})
+        self.assertEqual([t['name'] for t in res.data['results']], ['b popular', 'a rare'])
+        res = self.client.get(res.data['next'])
+        self.assertEqual([t['name'] for t in res.data['results']], ['c unused'])
+
+    def test_popular_pages_seek_through_ties(self):
+        """test popular pages walk tags sharing a count without OFFSET"""
+        for name in ('d tied', 'e tied', 'f tied', 'g tied'):
+            Tag.objects.create(user=self.user, name=name)
+        expected = [t['name'] for t in self.client.get(TAGS_URL, {'ordering': 'popular'}).data]
+
+        res = self.client.get(TAGS_URL, {'ordering': 'popular', 'page_size': 2})
+        names = [t['name'] for t in res.data['results']]
+        while res.data['next']:
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(res.data['next'])
+            names += [t['name'] for t in res.data['results']]
+            self.assertNotIn('OFFSET', ctx.captured_queries[-1]['sql'])
+        self.assertEqual(names, expected)
+
+    def test_invalid_popular_cursor(self):
+        """test popular cursors with values of the wrong type are rejected"""
+        from base64 import b64encode
+        from urllib.parse import urlencode
+
+        for position in ('["x","a",1]', '[[1],"a",1]', '[1,{"a":1},1]', '[1,"a",null]'):
+            cursor = b64encode(urlencode({'p': position}).encode('ascii')).decode('ascii')
+            res = self.client.get(TAGS_URL, {'ordering': 'popular', 'cursor': cursor})
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_unknown_ordering_rejected(self):
+        """test unknown orderings are a bad request"""
+        res = self.client.get(TAGS_URL, {'ordering': 'id'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Recipe
+from recipe import images
+
+
+class RecipeImageGCTests(TestCase):
+    """test unreferenced recipe images are collected"""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(MEDIA_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.storage = images.image_storage()
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+
+    def recipe(self, **params):
+        return Recipe.objects.create(
+            user=self.user, title='soup', time_minutes=5, price=1, **params
+        )
+
+    def save(self, data):
+        name = self.storage.save(f'{images.IMAGE_DIR}/image.jpg', ContentFile(data))
+        os.utime(self.storage.path(name), (0, 0))
+        return name
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_recipe_images', *args, stdout=out)
+        return out.getvalue()
+
+    def test_references_count_shared_files(self):
+        shared = self.save(b'shared')
+        self.recipe(image=shared, image_thumbnail=self.save(b'thumb'))
+        self.recipe(image=shared)
+
+        self.assertEqual(images.references()[shared], 2)
+
+    def test_gc_deletes_only_orphans(self):
+        """test files still used by any recipe are kept"""
+        used = self.save(b'used')
+        orphan = self.save(b'orphan')
+        self.recipe(image=used)
+
+        self.assertIn('orphaned images: 1 found, 6 bytes', self.gc('--dry-run'))
+        self.assertTrue(self.storage.exists(orphan))
+
+        self.assertIn('orphaned images: 1 deleted', self.gc())
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(used))
+
+    def test_gc_spares_recent_files(self):
+        """test files written in the grace period are kept"""
+        name = self.storage.save(f'{images.IMAGE_DIR}/image.jpg', ContentFile(b'new'))
+
+        self.gc()
+        self.assertTrue(self.storage.exists(name))
+
+        self.gc('--grace', '-1')
+        self.assertFalse(self.storage.exists(name))
+
+    def test_gc_deletes_stale_uploads_from_default_storage(self):
+        """test abandoned staged uploads are collected through default_storage"""
+        staged = default_storage.save(f'{images.STAGING_DIR}/upload.jpg', ContentFile(b'staged'))
+        self.assertNotIn(staged, list(images.stored_files(self.storage)))
+
+        self.assertIn('stale uploads: 0 deleted', self.gc())
+        self.assertTrue(default_storage.exists(staged))
+
+        os.utime(default_storage.path(staged), (0, 0))
+        self.assertIn('stale uploads: 1 found, 6 bytes', self.gc('--dry-run'))
+        self.assertIn('stale uploads: 1 deleted', self.gc())
+        self.assertFalse(default_storage.exists(staged))
@@ -0,0 +1,130 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    """return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class QueryBudgetTests(TestCase):
+    """test endpoints run a fixed number of queries whatever the data size"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        """create recipes each having its own tags and ingredients"""
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'recipe {i}',
+                time_minutes=10,
+                price=5.00
+            )
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'tag {i}'),
+                Tag.objects.create(user=self.user, name=f'tag {i}b'),
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'ingredient {i}')
+            )
+
+    def test_recipe_list_queries_constant(self):
+        """test listing recipes costs the same with 1 or 20 recipes"""
+        # recipes, tags, ingredients
+        self.create_recipes(1)
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.create_recipes(19)
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data), 20)
+
+    def test_recipe_list_filtered_queries_constant(self):
+        """test filtering recipes does not add per row queries"""
+        self.create_recipes(10)
+        tag_ids = ','.join(str(t.id) for t in Tag.objects.all())
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL, {'tags': tag_ids})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_recipe_detail_queries(self):
+        """test retrieving a recipe fetches its relations in bulk"""
+        self.create_recipes(1)
+        recipe = Recipe.objects.get()
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 2)
+
+    def test_tag_and_ingredient_list_single_query(self):
+        """test tags and ingredients are listed in one query"""
+        self.create_recipes(10)
+        for url in (TAGS_URL, INGREDIENT_URL):
+            with self.assertNumQueries(1):
+                self.client.get(url)
+            with self.assertNumQueries(1):
+                self.client.get(url, {'assigned_only': 1})
+
+    def count_queries(self, method, url, payload):
+        with CaptureQueriesContext(connection) as queries:
+            res = method(url, payload, format='json')
+        self.assertIn(res.status_code, (status.HTTP_200_OK, status.HTTP_201_CREATED))
+        return len(queries.captured_queries)
+
+    def test_recipe_write_queries_constant(self):
+        """test creating or updating a recipe costs the same with 1 or 30 ingredients"""
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'ingredient {i}')
+            for i in range(30)
+        ]
+        tag = Tag.objects.create(user=self.user, name='tag')
+
+        def payload(count):
+            return {
+                'title': 'soup', 'time_minutes': 10, 'price': '5.00',
+                'tags': [tag.id], 'ingredients': [i.id for i in ingredients[:count]],
+            }
+
+        one = self.count_queries(self.client.post, RECIPE_URL, payload(1))
+        thirty = self.count_queries(self.client.post, RECIPE_URL, payload(30))
+        self.assertEqual(one, thirty)
+
+        recipe = Recipe.objects.create(user=self.user, title='stew', time_minutes=5, price=1)
+        one = self.count_queries(self.client.put, detail_url(recipe.id), payload(1))
+        recipe = Recipe.objects.create(user=self.user, title='stew', time_minutes=5, price=1)
+        thirty = self.count_queries(self.client.put, detail_url(recipe.id), payload(30))
+        self.assertEqual(one, thirty)
+
+    def test_recipe_write_with_names_queries_constant(self):
+        """test naming 1 or 20 new ingredients costs the same"""
+        def payload(count, prefix):
+            return {
+                'title': 'soup', 'time_minutes': 10, 'price': '5.00', 'tags': [],
+                'ingredient_names': [f'{prefix} {i}' for i in range(count)],
+            }
+
+        one = self.count_queries(self.client.post, RECIPE_URL, payload(1, 'a'))
+        twenty = self.count_queries(self.client.post, RECIPE_URL, payload(20, 'b'))
+        self.assertEqual(one, twenty)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 21)
@@ -1,17 +1,27 @@
 import tempfile
 import os
+import threading
+from io import BytesIO
+from concurrent.futures import Future
+from unittest import skipUnless
+from unittest.mock import patch
 from PIL import Image
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
+from recipe import images, rows
+from recipe.cache import get_cache
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
 
 
 def image_upload_url(recipe_id):
@@ -53,6 +63,15 @@ def sample_recipe(user, **params):
     return Recipe.objects.create(user=user, **defaults)
 
 
+class InlineExecutor:
+    """executor running jobs in the calling thread"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
 class PublicRecipeAPITests(TestCase):
     """test unauthenticated API access"""
 
@@ -161,6 +180,110 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_invalid_ids(self):
+        """test every unknown, foreign or malformed id is reported"""
+        other = get_user_model().objects.create(email="other@gmail.com", password="pass")
+        foreign = sample_ingredient(user=other, name="salt")
+        own = sample_ingredient(user=self.user, name="pepper")
+        payload = {
+            'title': 'soup',
+            'ingredients': [own.id, foreign.id, 9999, 'x'],
+            'time_minutes': 30,
+            'price': 7.00
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['ingredients'], [
+            'Incorrect type. Expected pk value, received str.',
+            f'Invalid pk "{foreign.id}" - object does not exist.',
+            'Invalid pk "9999" - object does not exist.',
+        ])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_with_names(self):
+        """test named tags/ingredients are reused or created for the user"""
+        other = get_user_model().objects.create(email="other@gmail.com", password="pass")
+        sample_ingredient(user=other, name="salt")
+        vegan = sample_tag(user=self.user, name="vegan")
+        quick = sample_tag(user=self.user, name="quick")
+        payload = {
+            'title': 'soup',
+            'tags': [quick.id],
+            'tag_names': ['vegan', ' quick ', 'spicy', 'spicy'],
+            'ingredient_names': ['salt', 'pepper'],
+            'time_minutes': 30,
+            'price': 7.00
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('tag_names', res.data)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(t.name for t in recipe.tags.all()), ['quick', 'spicy', 'vegan']
+        )
+        self.assertIn(vegan, recipe.tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            sorted(i.name for i in recipe.ingredients.all()), ['pepper', 'salt']
+        )
+        self.assertTrue(all(i.user == self.user for i in recipe.ingredients.all()))
+
+    def test_create_recipe_requires_tags_and_ingredients(self):
+        """test tags and ingredients must be sent on create, as ids or names"""
+        payload = {'title': 'soup', 'time_minutes': 30, 'price': 7.00}
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(res.data), {'tags', 'ingredients'})
+        self.assertFalse(Recipe.objects.exists())
+
+        payload.update({'tags': [], 'ingredient_names': ['salt']})
+        res = self.client.post(RECIPE_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_full_update_recipe_requires_tags(self):
+        """test a PUT leaving out tags is rejected instead of keeping them"""
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        recipe.tags.add(tag)
+        payload = {'title': 'kebab', 'time_minutes': 30, 'price': 13.0, 'ingredients': []}
+
+        res = self.client.put(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(res.data), {'tags'})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'sample title')
+        self.assertEqual(list(recipe.tags.all()), [tag])
+
+    def test_update_recipe_names_add_to_tags(self):
+        """test names without ids add to the recipe's current tags"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user, name="old"))
+
+        res = self.client.patch(
+            detail_url(recipe.id), {'tag_names': ['new', 'old']}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(t.name for t in recipe.tags.all()), ['new', 'old'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_update_recipe_names_with_ids_replace_tags(self):
+        """test names sent with ids make up the whole new set with them"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user, name="old"))
+        kept = sample_tag(user=self.user, name="kept")
+
+        res = self.client.patch(
+            detail_url(recipe.id), {'tags': [kept.id], 'tag_names': ['new']}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(t.name for t in recipe.tags.all()), ['kept', 'new'])
+
     """ note , update already comes out of the box with django , 
     this feature implemented , no need to test it, 
     this code added just to fully cover our implemented features"""
@@ -208,6 +331,7 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(len(tags), 0)
 
 
+@override_settings(RECIPE_IMAGE_ASYNC=False)
 class RecipeImageUploadTests(TestCase):
 
     def setUp(self):
@@ -221,7 +345,9 @@ class RecipeImageUploadTests(TestCase):
 
     def tearDown(self):
         """remove created files so it won't remain in filesystem"""
+        self.recipe.refresh_from_db()
         self.recipe.image.delete()
+        self.recipe.image_thumbnail.delete()
 
     def test_upload_image_to_recipe(self):
         """test uploading an image to recipe"""
@@ -235,9 +361,121 @@ class RecipeImageUploadTests(TestCase):
             res = self.client.post(url, {'image': ntf}, format='multipart')
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(os.path.exists(self.recipe.image_thumbnail.path))
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=50, RECIPE_IMAGE_THUMBNAIL_SIZE=20)
+    def test_upload_image_downscaled_and_stripped(self):
+        """test derivatives are bounded and carry no metadata"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            img = Image.new('RGB', (200, 100))
+            img.save(ntf, format='JPEG', comment=b'taken at home')
+            ntf.seek(0)
+            self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (50, 25))
+            self.assertNotIn('comment', image.info)
+        with Image.open(self.recipe.image_thumbnail.path) as image:
+            self.assertEqual(image.size, (20, 10))
+
+    def test_encode_drops_metadata_kept_in_info(self):
+        """test metadata left in image.info is not written back, whatever Pillow does with it"""
+        for mode, ext in (('RGB', 'jpg'), ('RGBA', 'png')):
+            img = Image.new(mode, (20, 10))
+            img.info.update({'comment': b'taken at home', 'exif': b'Exif\x00\x00'})
+            data, extension = images._encode(img, 10)
+            self.assertEqual(extension, ext)
+            with Image.open(BytesIO(data)) as image:
+                self.assertEqual(image.size, (10, 5))
+                for key in ('comment', 'exif', 'icc_profile'):
+                    self.assertNotIn(key, image.info)
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=50)
+    def test_upload_image_exif_orientation_applied(self):
+        """test a sideways stored photo is saved upright, without its EXIF"""
+        # little endian TIFF IFD with a single Orientation=6 (rotate 90 CW) entry
+        exif = (
+            b'Exif\x00\x00II*\x00\x08\x00\x00\x00\x01\x00'
+            b'\x12\x01\x03\x00\x01\x00\x00\x00\x06\x00\x00\x00\x00\x00\x00\x00'
+        )
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (200, 100)).save(ntf, format='JPEG', exif=exif)
+            ntf.seek(0)
+            self.client.post(image_upload_url(self.recipe.id), {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (25, 50))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(RECIPE_IMAGE_ASYNC=True)
+    def test_rolled_back_upload_frees_its_slot(self):
+        """test an upload whose transaction rolls back does not hold a queue slot"""
+        def upload():
+            buffer = BytesIO()
+            Image.new('RGB', (10, 10)).save(buffer, format='JPEG')
+            return SimpleUploadedFile('photo.jpg', buffer.getvalue())
+
+        with patch.object(images, '_executor', InlineExecutor()), \
+                patch.object(images, '_pending', threading.BoundedSemaphore(1)):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                images.schedule(self.recipe, upload())
+                raise RuntimeError
+            with patch('recipe.images.transaction.on_commit') as on_commit:
+                images.schedule(self.recipe, upload())
+            self.assertTrue(on_commit.called)
+
+    def test_upload_same_image_stored_once(self):
+        """test identical uploads share the files of the first one"""
+        other = sample_recipe(user=self.user)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            for recipe in (self.recipe, other):
+                ntf.seek(0)
+                self.client.post(image_upload_url(recipe.id), {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        self.assertEqual(self.recipe.image_thumbnail.name, other.image_thumbnail.name)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_BYTES=100)
+    def test_upload_image_too_large(self):
+        """test uploads over the size limit are rejected up front"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+            Image.new('RGB', (100, 100)).save(ntf, format='PNG')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, '')
+
+    @override_settings(RECIPE_IMAGE_ASYNC=True)
+    def test_upload_image_queued(self):
+        """test the upload returns before processing in async mode"""
+        url = image_upload_url(self.recipe.id)
+        with patch('recipe.images.transaction.on_commit') as on_commit, \
+                tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PROCESSING)
+        # the data version bump, then the queued job
+        self.assertEqual(on_commit.call_count, 2)
+        # run the queued job inline, the worker threads use another connection
+        with patch('recipe.images.get_executor', return_value=InlineExecutor()), \
+                patch('recipe.images.connection.close'):
+            on_commit.call_args[0][0]()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
 
     def test_upload_image_bad_request(self):
         """test uploading an invalid image"""
@@ -289,3 +527,378 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn(serializer1.data, res.data)
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
+
+
+class RecipePaginationTests(TestCase):
+    """test cursor pagination of the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email='test@gmail.com',
+            password="pass124"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            sample_recipe(user=self.user, title=f'recipe {i}') for i in range(5)
+        ]
+
+    def test_list_not_paginated_by_default(self):
+        """test clients not asking for pages still get a plain list"""
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+
+    def test_walk_pages_with_cursor(self):
+        """test following next links returns every recipe once in id order"""
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNone(res.data['previous'])
+        ids = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [r.id for r in self.recipes])
+
+    def test_deep_page_seeks_instead_of_offset(self):
+        """test later pages filter on the last seen id and do not use OFFSET"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(res.data['next'])
+        sql = ctx.captured_queries[0]['sql']
+        self.assertNotIn('OFFSET', sql)
+        self.assertIn('"core_recipe"."id" >', sql)
+
+    def test_invalid_cursor_position(self):
+        """test cursors not holding values of the ordering columns are rejected"""
+        from base64 import b64encode
+        from urllib.parse import urlencode
+
+        positions = ('12', '["x"]', '[{"a":1}]', '[[1]]', '[null]', '[1, 2]', f'[{2 ** 64}]')
+        for position in positions:
+            cursor = b64encode(urlencode({'p': position}).encode('ascii')).decode('ascii')
+            res = self.client.get(RECIPE_URL, {'cursor': cursor})
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    @override_settings(API_MAX_PAGE_SIZE=3)
+    def test_page_size_bounded(self):
+        """test clients cannot request pages above the configured maximum"""
+        res = self.client.get(RECIPE_URL, {'page_size': 1000})
+        self.assertEqual(len(res.data['results']), 3)
+
+
+class RecipeBulkCreateTests(TestCase):
+    """test importing many recipes in one request"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email='test@gmail.com',
+            password="pass124"
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user)
+        self.ingredient = sample_ingredient(user=self.user)
+
+    def test_bulk_create_json(self):
+        """test a JSON array creates every recipe with its relations"""
+        payload = [
+            {
+                'title': f'recipe {i}',
+                'time_minutes': 5,
+                'price': '3.50',
+                'tags': [self.tag.id],
+                'ingredients': [self.ingredient.id],
+            }
+            for i in range(3)
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['results']), 3)
+        for result in res.data['results']:
+            recipe = Recipe.objects.get(id=result['id'])
+            self.assertEqual(recipe.user, self.user)
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_ndjson(self):
+        """test recipes can be sent as newline delimited JSON"""
+        body = (
+            '{"title": "soup", "time_minutes": 5, "price": "1.00"}\n'
+            '\n'
+            '{"title": "stew", "time_minutes": 50, "price": "2.00"}\n'
+        )
+        res = self.client.post(BULK_URL, body, content_type='application/x-ndjson')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)), ['soup', 'stew']
+        )
+
+    def test_bulk_create_partial_failure(self):
+        """test invalid items are reported without blocking the valid ones"""
+        user2 = get_user_model().objects.create(email='other@gmail.com')
+        foreign_tag = sample_tag(user=user2)
+        payload = [
+            {'title': 'ok', 'time_minutes': 5, 'price': '1.00', 'tags': [self.tag.id]},
+            {'title': 'bad tag', 'time_minutes': 5, 'price': '1.00', 'tags': [foreign_tag.id]},
+            {'title': 'no time', 'price': '1.00'},
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        results = res.data['results']
+        self.assertEqual(results[0]['status'], status.HTTP_201_CREATED)
+        self.assertEqual(results[1]['status'], status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', results[1]['errors'])
+        self.assertIn('time_minutes', results[2]['errors'])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_bulk_create_related_ids_checked_once(self):
+        """test tags and ingredients are validated in one query each"""
+        payload = [
+            {
+                'title': f'recipe {i}',
+                'time_minutes': 5,
+                'price': '3.50',
+                'tags': [self.tag.id, 999],
+                'ingredients': [self.ingredient.id],
+            }
+            for i in range(20)
+        ]
+        with self.assertNumQueries(2):
+            res = self.client.post(BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_BULK_MAX_ITEMS=2)
+    def test_bulk_create_too_many(self):
+        """test the number of recipes per request is bounded"""
+        payload = [{'title': 'x', 'time_minutes': 1, 'price': '1.00'}] * 3
+        res = self.client.post(BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+
+class RecipeSearchTests(TestCase):
+    """test searching recipes by title, tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email='test@gmail.com',
+            password="pass124"
+        )
+        self.client.force_authenticate(self.user)
+        self.soup = sample_recipe(user=self.user, title='tomato soup')
+        self.cake = sample_recipe(user=self.user, title='carrot cake')
+        self.cake.tags.add(sample_tag(user=self.user, name='dessert'))
+        self.cake.ingredients.add(
+            sample_ingredient(user=self.user, name='carrots'),
+            sample_ingredient(user=self.user, name='walnuts'),
+        )
+
+    def search(self, term):
+        res = self.client.get(RECIPE_URL, {'search': term})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [r['id'] for r in res.data]
+
+    def test_search_title(self):
+        """test recipes are found by title"""
+        self.assertEqual(self.search('soup'), [self.soup.id])
+
+    def test_search_tag_and_ingredient_names(self):
+        """test recipes are found by tag and ingredient names"""
+        self.assertEqual(self.search('dessert'), [self.cake.id])
+        self.assertEqual(self.search('walnuts'), [self.cake.id])
+
+    def test_search_limited_to_user(self):
+        """test other users' recipes are never returned"""
+        user2 = get_user_model().objects.create(email='other@gmail.com')
+        sample_recipe(user=user2, title='pea soup')
+        self.assertEqual(self.search('soup'), [self.soup.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'tsvector search needs PostgreSQL')
+    def test_search_ranked_and_kept_up_to_date(self):
+        """test title matches rank first and renames are picked up"""
+        self.soup.ingredients.add(sample_ingredient(user=self.user, name='carrot'))
+        self.assertEqual(self.search('carrot'), [self.cake.id, self.soup.id])
+
+        tag = self.cake.tags.get()
+        tag.name = 'sweet'
+        tag.save()
+        self.assertEqual(self.search('dessert'), [])
+        self.assertEqual(self.search('sweet'), [self.cake.id])
+
+    def test_search_pages_keep_result_order(self):
+        """test paging through a search returns the results in ranked order"""
+        self.soup.ingredients.add(sample_ingredient(user=self.user, name='carrot'))
+        sample_recipe(user=self.user, title='carrot salad')
+        expected = self.search('carrot')
+        self.assertEqual(len(expected), 3)
+
+        res = self.client.get(RECIPE_URL, {'search': 'carrot', 'page_size': 1})
+        ids = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, expected)
+
+
+class RecipeMatchFilterTests(TestCase):
+    """test any/all matching of tag and ingredient filters"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email='test@gmail.com',
+            password="pass124"
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name='vegan')
+        self.quick = sample_tag(user=self.user, name='quick')
+        self.both = sample_recipe(user=self.user, title='salad')
+        self.both.tags.add(self.vegan, self.quick)
+        self.one = sample_recipe(user=self.user, title='stew')
+        self.one.tags.add(self.vegan)
+        sample_recipe(user=self.user, title='steak')
+
+    def filter_ids(self, **params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return sorted(r['id'] for r in res.data)
+
+    def test_match_any_no_duplicates(self):
+        """test a recipe matching several tags is returned once"""
+        tags = f'{self.vegan.id},{self.quick.id}'
+        self.assertEqual(
+            self.filter_ids(tags=tags), sorted([self.both.id, self.one.id])
+        )
+
+    def test_match_all(self):
+        """test match=all only returns recipes having every tag"""
+        tags = f'{self.vegan.id},{self.quick.id},{self.vegan.id}'
+        self.assertEqual(self.filter_ids(tags=tags, match='all'), [self.both.id])
+
+    def test_match_all_tags_and_ingredients(self):
+        """test match=all combines tag and ingredient filters"""
+        oil = sample_ingredient(user=self.user, name='oil')
+        self.one.ingredients.add(oil)
+        self.assertEqual(
+            self.filter_ids(tags=str(self.vegan.id), ingredients=str(oil.id), match='all'),
+            [self.one.id]
+        )
+
+    def test_match_invalid(self):
+        """test unknown match modes are rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': str(self.vegan.id), 'match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSparseFieldsTests(TestCase):
+    """test ?fields= and ?expand= on recipe reads"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email='test@gmail.com',
+            password="pass124"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+        self.tag = sample_tag(user=self.user)
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(sample_ingredient(user=self.user))
+
+    def test_fields_limit_output_and_columns(self):
+        """test only the requested fields are fetched and rendered"""
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+        self.assertEqual(res.data, [{'id': self.recipe.id, 'title': self.recipe.title}])
+        # recipes only: no relation is prefetched
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('"price"', ctx.captured_queries[-1]['sql'])
+
+    def test_expand_relations(self):
+        """test expanded relations are nested objects"""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,tags', 'expand': 'tags'})
+        self.assertEqual(
+            res.data[0]['tags'], [{'id': self.tag.id, 'name': self.tag.name}]
+        )
+        self.assertNotIn('ingredients', res.data[0])
+
+    def test_detail_fields(self):
+        """test the detail view honours fields too"""
+        res = self.client.get(detail_url(self.recipe.id), {'fields': 'title,tags'})
+        self.assertEqual(set(res.data), {'title', 'tags'})
+        self.assertEqual(res.data['tags'][0]['name'], self.tag.name)
+
+    def test_default_unchanged(self):
+        """test clients not asking for fields get the full representation"""
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data, RecipeSerializer([self.recipe], many=True).data)
+
+    def test_unknown_fields_rejected(self):
+        """test unknown fields or expansions are rejected"""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,user'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(RECIPE_URL, {'expand': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeFastListTests(TestCase):
+    """test recipe lists rendered from values() rows"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email='test@gmail.com',
+            password="pass124"
+        )
+        self.client.force_authenticate(self.user)
+        tags = [sample_tag(user=self.user, name=f'tag {i}') for i in range(3)]
+        ingredients = [sample_ingredient(user=self.user, name=f'ing {i}') for i in range(3)]
+        for i in range(5):
+            recipe = sample_recipe(user=self.user, title=f'recipe {i}', price=i + 0.5)
+            recipe.tags.set(tags[i % 3:])
+            recipe.ingredients.set(reversed(ingredients[:i % 3 + 1]))
+        sample_recipe(user=self.user, title='bare', link='')
+
+    def test_output_identical_to_serializer(self):
+        """test the rendered JSON matches the model serializer byte for byte"""
+        with override_settings(API_FAST_LISTS=False):
+            slow = self.client.get(RECIPE_URL)
+        fast = self.client.get(RECIPE_URL)
+        self.assertEqual(fast.content, slow.content)
+        recipes = Recipe.objects.order_by('id')
+        for recipe, item in zip(recipes, fast.data):
+            expected = RecipeSerializer(recipe).data
+            expected['tags'] = sorted(expected['tags'])
+            expected['ingredients'] = sorted(expected['ingredients'])
+            self.assertEqual(item, expected)
+
+    def test_identical_with_fields_and_pages(self):
+        """test sparse fields and pages render the same on both paths"""
+        params = {'fields': 'id,price,tags', 'page_size': 2}
+        with override_settings(API_FAST_LISTS=False):
+            slow = self.client.get(RECIPE_URL, params)
+        fast = self.client.get(RECIPE_URL, params)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_write_only_fields_not_rendered(self):
+        """test rows render the readable fields only, skipping write only names"""
+        serializer = RecipeSerializer(Recipe.objects.first())
+        names = [field.field_name for field in rows.readable_fields(serializer)]
+        self.assertEqual(names, list(serializer.data))
+        self.assertNotIn('tag_names', names)
+
+    def test_tag_list_identical(self):
+        """test tag lists render the same on both paths"""
+        url = reverse('recipe:tag-list')
+        with override_settings(API_FAST_LISTS=False):
+            slow = self.client.get(url)
+        get_cache().clear()
+        fast = self.client.get(url)
+        self.assertEqual(fast.content, slow.content)
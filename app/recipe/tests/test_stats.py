@@ -0,0 +1,145 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import cache, stats
+
+STATS_URL = reverse('recipe:recipe-stats')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+class RecipeStatsTests(TestCase):
+    """test the per user recipe statistics"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = get_user_model().objects.create(
+            email="test@gmail.com",
+            password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe(self, minutes, price, user=None):
+        return Recipe.objects.create(
+            user=user or self.user, title='recipe', time_minutes=minutes, price=price
+        )
+
+    def assertFresh(self):
+        """the served totals match a fresh aggregate"""
+        res = self.client.get(STATS_URL)
+        fresh = stats.compute_totals(self.user)
+        self.assertEqual(res.data['count'], fresh['count'])
+        self.assertEqual(
+            [bucket['count'] for bucket in res.data['time_histogram']], fresh['histogram']
+        )
+
+    def test_stats_values(self):
+        """test averages, histogram and top lists"""
+        soup = self.recipe(10, '4.00')
+        stew = self.recipe(45, '6.50')
+        self.recipe(200, '1.00')
+        vegan = Tag.objects.create(user=self.user, name='vegan')
+        Tag.objects.create(user=self.user, name='unused')
+        salt = Ingredient.objects.create(user=self.user, name='salt')
+        soup.tags.add(vegan)
+        stew.tags.add(vegan)
+        stew.ingredients.add(salt)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(res.data['avg_price'], '3.83')
+        self.assertEqual(res.data['avg_time_minutes'], 85.0)
+        self.assertEqual(
+            [bucket['count'] for bucket in res.data['time_histogram']], [1, 0, 1, 0, 1]
+        )
+        self.assertEqual(res.data['time_histogram'][2], {
+            'min_minutes': 30, 'max_minutes': 59, 'count': 1
+        })
+        self.assertEqual(
+            res.data['top_tags'], [{'id': vegan.id, 'name': 'vegan', 'recipe_count': 2}]
+        )
+        self.assertEqual(
+            res.data['top_ingredients'], [{'id': salt.id, 'name': 'salt', 'recipe_count': 1}]
+        )
+
+    def test_stats_without_recipes(self):
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['count'], 0)
+        self.assertIsNone(res.data['avg_price'])
+        self.assertIsNone(res.data['avg_time_minutes'])
+
+    def test_stats_limited_to_user(self):
+        other = get_user_model().objects.create(email="other@gmail.com", password="pass")
+        self.recipe(10, '4.00', user=other)
+        Tag.objects.create(user=other, name='other').recipe_set.add(
+            self.recipe(10, '1.00', user=other)
+        )
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['count'], 0)
+        self.assertEqual(res.data['top_tags'], [])
+
+    def test_cached_stats_skip_the_database(self):
+        """test a second request does not aggregate again"""
+        self.recipe(10, '4.00')
+        self.client.get(STATS_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['count'], 1)
+        self.assertFalse(any('core_recipe' in q['sql'] for q in queries.captured_queries))
+
+    def test_writes_refresh_totals(self):
+        """test create, update, delete and bulk import refresh the totals"""
+        soup = self.recipe(10, '4.00')
+        self.client.get(STATS_URL)
+
+        stew = self.recipe(45, '6.50')
+        self.assertFresh()
+        soup.time_minutes = 130
+        soup.price = Decimal('2.25')
+        soup.save()
+        self.assertFresh()
+        stew.delete()
+        self.assertFresh()
+        self.client.post(BULK_URL, [
+            {'title': 'bulk', 'time_minutes': 20, 'price': '3.50'}
+        ], format='json')
+        self.assertFresh()
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(res.data['avg_price'], '2.88')
+
+    def test_rolled_back_write_not_counted(self):
+        self.recipe(10, '4.00')
+        self.client.get(STATS_URL)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.recipe(20, '1.00')
+            raise RuntimeError
+
+        self.assertEqual(self.client.get(STATS_URL).data['count'], 1)
+
+    def test_top_lists_follow_assignment(self):
+        soup = self.recipe(10, '4.00')
+        self.client.get(STATS_URL)
+
+        soup.tags.add(Tag.objects.create(user=self.user, name='vegan'))
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual([tag['name'] for tag in res.data['top_tags']], ['vegan'])
@@ -111,4 +111,13 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only':1})
         self.assertEqual(len(res.data), 1)
 
-
+    def test_retrieve_tags_paginated_by_name(self):
+        """test tag pages follow name order"""
+        for name in ('dinner', 'brunch', 'cake'):
+            Tag.objects.create(user=self.user, name=name)
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        self.assertEqual(
+            [t['name'] for t in res.data['results']], ['brunch', 'cake']
+        )
+        res = self.client.get(res.data['next'])
+        self.assertEqual([t['name'] for t in res.data['results']], ['dinner'])
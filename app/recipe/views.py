@@ -1,9 +1,14 @@
+from django.conf import settings
+from django.db.models import Count, Prefetch
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from core.authentication import CachedTokenAuthentication
+from core.middleware import ReplicaReadMixin
 from core.models import Tag, Ingredient, Recipe
 from .serializers import (
     TagSerializer,
@@ -12,27 +17,71 @@ from .serializers import (
     RecipeDetailSerializer,
     RecipeImageSerializer,
 )
+from .conditional import ConditionalGetMixin
+from .pagination import KeysetPagination, NameKeysetPagination
+from .parsers import NDJSONParser
+from . import bulk, cache, images, rows, search, stats
 
 
 class BaseRecipeAttrViewSet(
+    ConditionalGetMixin,
+    ReplicaReadMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.CreateModelMixin
 ):
     """" base ViewSet for user owned recipe attribute"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = NameKeysetPagination
+    # ?ordering= choices, ids break ties for the cursor
+    orderings = {
+        'name': ('name', 'id'),
+        'popular': ('-recipe_count', 'name', 'id'),
+    }
 
-    def get_queryset(self):
-        """return objects for current authenticated user only"""
-        assigned_only = bool(
+    def _assigned_only(self):
+        """return whether only objects assigned to a recipe were asked for"""
+        return bool(
             int(self.request.query_params.get('assigned_only', 0))  # 0 will be false if not converted to int
         )
+
+    def list_ordering(self):
+        """return the ordering asked for with ?ordering=, validated"""
+        name = self.request.query_params.get('ordering', 'name')
+        if name not in self.orderings:
+            raise ValidationError(
+                {'ordering': f'must be one of {", ".join(sorted(self.orderings))}'}
+            )
+        return name, self.orderings[name]
+
+    def get_queryset(self):
+        """return objects for current authenticated user only"""
         queryset = self.queryset
-        if assigned_only:
+        if self._assigned_only():
             # return only tags or ingredients assigned to a recipe
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by('name').distinct()
+            queryset = queryset.filter(recipe_count__gt=0)
+        _, ordering = self.list_ordering()
+        return queryset.filter(user=self.request.user).order_by(*ordering)
+
+    def list(self, request, *args, **kwargs):
+        """list objects, served from the per user cache when possible"""
+        if self.paginator is not None and self.paginator.is_requested(request):
+            return super().list(request, *args, **kwargs)
+        model = self.queryset.model
+        ordering, _ = self.list_ordering()
+        variant = f'{"assigned" if self._assigned_only() else "all"}:{ordering}'
+        version = self.get_data_version()
+        data = cache.get_attr_list(model, request.user.pk, version, variant)
+        if data is None:
+            if settings.API_FAST_LISTS:
+                data = rows.serialize_rows(
+                    self.get_serializer(), self.get_queryset().values('id', 'name')
+                )
+            else:
+                data = self.get_serializer(self.get_queryset(), many=True).data
+            cache.set_attr_list(model, request.user.pk, version, variant, data)
+        return Response(data)
 
     def perform_create(self, serializer):
         """assign created object to current user"""
@@ -51,30 +100,140 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """manage Recipes in DB"""
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    # actions honouring ?fields= and ?expand=
+    sparse_actions = ('list', 'retrieve')
+    # related model of each relation field, fetched up front to avoid one query per row
+    relation_models = {'tags': Tag, 'ingredients': Ingredient}
 
     def _params_to_ints(self, qs):
         """convert a list of string IDs to a list of integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_related(self, queryset, through, column, ids, match_all):
+        """filter recipes linked to any (or all) of ids through an M2M table
+
+        a subquery on the through table instead of a join, so a recipe
+        matching several ids is returned once"""
+        ids = set(ids)
+        links = through.objects.filter(**{f'{column}__in': ids})
+        if match_all:
+            # (recipe, tag) pairs are unique in the through table
+            links = links.values('recipe_id').annotate(
+                matched=Count(column)
+            ).filter(matched=len(ids))
+        return queryset.filter(id__in=links.values('recipe_id'))
+
+    def _search_term(self):
+        """return the ?search= term, empty when not searching"""
+        return self.request.query_params.get('search', '').strip()
+
+    def list_ordering(self):
+        """return the (name, ordering) pages follow, best matches first when ranked"""
+        if self._search_term() and search.is_supported():
+            return 'rank', ('-rank', 'id')
+        return 'id', ('id',)
+
     def get_queryset(self):
         """retrieve recipes of the authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'must be "any" or "all"'})
         queryset = self.queryset
         if tags:
             tags_id = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tags_id)  # django syntax to filter over IDS
+            queryset = self._filter_related(
+                queryset, Recipe.tags.through, 'tag_id', tags_id, match == 'all'
+            )
         if ingredients:
             ingredients_id = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_id)
+            queryset = self._filter_related(
+                queryset, Recipe.ingredients.through, 'ingredient_id', ingredients_id, match == 'all'
+            )
+        term = self._search_term()
+        if term:
+            queryset = search.search_recipes(queryset, term)
+        if self.action in self.sparse_actions:
+            queryset = self._only_requested(queryset)
         return queryset.filter(user=self.request.user)
 
+    def _sparse_params(self):
+        """return the (fields, expand) asked for, fields is None when not limited"""
+        if not hasattr(self, '_sparse'):
+            allowed = RecipeSerializer.rendered_fields
+            fields = expand = None
+            if 'fields' in self.request.query_params:
+                fields = [f for f in self.request.query_params['fields'].split(',') if f]
+                unknown = set(fields) - set(allowed)
+                if unknown:
+                    raise ValidationError({'fields': f'unknown fields: {", ".join(sorted(unknown))}'})
+            if 'expand' in self.request.query_params:
+                expand = [f for f in self.request.query_params['expand'].split(',') if f]
+                unknown = set(expand) - set(self.relation_models)
+                if unknown:
+                    raise ValidationError({'expand': f'cannot expand: {", ".join(sorted(unknown))}'})
+            self._sparse = (fields, expand or [])
+        return self._sparse
+
+    def _only_requested(self, queryset):
+        """load only the columns and relations the response renders"""
+        fields, expand = self._sparse_params()
+        fields = fields or RecipeSerializer.rendered_fields
+        queryset = queryset.only(*(f for f in fields if f not in self.relation_models))
+        for name, model in self.relation_models.items():
+            if name not in fields:
+                continue
+            nested = self.action == 'retrieve' or name in expand
+            related = model.objects.only('id', 'name') if nested else model.objects.only('id')
+            # id order, as rendered by the values() list path
+            related = related.order_by('id')
+            queryset = queryset.prefetch_related(Prefetch(name, queryset=related))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """list recipes from values() rows, unless relations are expanded"""
+        _, expand = self._sparse_params()
+        if expand or not settings.API_FAST_LISTS:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer()
+        names = [field.field_name for field in rows.readable_fields(serializer)]
+        columns = {name for name in names if name not in self.relation_models}
+        queryset = self.filter_queryset(self.get_queryset())
+        # the cursor of the next page is read from the ordering columns
+        _, ordering = self.list_ordering()
+        ordered = {order.lstrip('-') for order in ordering}
+        queryset = queryset.prefetch_related(None).values(*({'id'} | columns | ordered))
+
+        page = self.paginate_queryset(queryset)
+        recipes = list(queryset if page is None else page)
+        recipe_ids = [recipe['id'] for recipe in recipes]
+        related = {}
+        for name in self.relation_models:
+            if name in names:
+                through = getattr(Recipe, name).through
+                column = f'{self.relation_models[name]._meta.model_name}_id'
+                related[name] = rows.related_ids(through, column, recipe_ids)
+        data = rows.serialize_rows(serializer, recipes, related)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def get_serializer(self, *args, **kwargs):
+        """pass ?fields= and ?expand= on to the serializer"""
+        if self.action in self.sparse_actions:
+            fields, expand = self._sparse_params()
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
     def get_serializer_class(self):
         """return the appropriate serializer"""
         if self.action == 'retrieve':
@@ -87,19 +246,58 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """create new recipe & assign it to current user"""
         serializer.save(user=self.request.user)
 
+    @action(
+        methods=['POST'], detail=False, url_path='bulk',
+        parser_classes=(JSONParser, NDJSONParser),
+    )
+    def bulk_create(self, request):
+        """create many recipes from a JSON array or NDJSON, with a result per item"""
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'detail': 'expected a list of recipes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.RECIPE_BULK_MAX_ITEMS:
+            return Response(
+                {'detail': f'at most {settings.RECIPE_BULK_MAX_ITEMS} recipes per request'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        results = bulk.bulk_create_recipes(request.user, items)
+        created = sum(1 for r in results if r['status'] == status.HTTP_201_CREATED)
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'results': results}, status=response_status)
+
+    @action(methods=['GET'], detail=False, url_path='stats')
+    def stats(self, request):
+        """averages, time histogram and top tags/ingredients of the user's recipes"""
+        return Response(stats.get_stats(request.user))
+
     # detail=True: means this action will be for details <=> specific recipe
     @action(methods=['POST'], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
+        """accept an image, it is processed in the background"""
         recipe = self.get_object()
         serializer = self.get_serializer(
             recipe,
             data=request.data,
         )
         if serializer.is_valid():
-            serializer.save()
+            try:
+                serializer.save()
+            except images.ImageQueueFull:
+                return Response(
+                    {'detail': 'too many images are being processed, retry later'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK
+                status=status.HTTP_202_ACCEPTED
             )
         return Response(
             serializer.errors,
@@ -1,7 +1,9 @@
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.utils.translation import ugettext_lazy as _
 
+from core import hashing
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,8 +14,9 @@ class UserSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """ create new user with encrypted password and return it """
         password = validated_data.pop('password', None)
-        user = get_user_model().objects.create(**validated_data)
-        user.set_password(password)
+        user = get_user_model()(**validated_data)
+        # hashed in the pool before saving, a saturated pool is a 503
+        hashing.set_password(user, password)
         user.save()
         return user
 
@@ -21,7 +24,7 @@ class UserSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password', None)
         user = super(UserSerializer, self).update(instance, validated_data)
         if password:
-            user.set_password(password)
+            hashing.set_password(user, password)
             user.save()
         return user
 
@@ -38,11 +41,8 @@ class AuthTokenSerializer(serializers.Serializer):
         email = attrs.get('email')
         password = attrs.get('password')
 
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
-        )
+        # hashed in the pool, a saturated pool is a 503
+        user = hashing.authenticate(email, password)
         if not user:
             msg = _("authentication failed")
             raise serializers.ValidationError(msg, code='authentication')